@@ -10,55 +10,26 @@ Input: a set of CARs generated from rule_generator_main (in rulegenerator.py) an
 Output: classifier_M2
 """
 import sys
+import bisect
+import bitset
 import ruleitem
+import rulebudget
 import rulegenerator
-from functools import cmp_to_key
 
-def check_cover(data_line, rule):
-    """ Check whether the rule covers a single line in the data_list,
-    the line is each row in the original data_list """
-    for item in rule.condset:
-        # check if  the dataline and the LHS of the rule are the same
-        # if different, return None
-        if data_line[item] != rule.condset[item]:
-            return None
-    # if same and they belong to the same class label, return ture
-    if data_line[-1] == rule.label:
-        return True
-    # else return false
-    else:
-        return False
+def precedence_key(rule):
+    """ Sort key of the relation ">" in precedence: the higher the confidence, the higher the support,
+    the shorter the condset (generated earlier), the smaller the key. """
+    return -rule.confidence, -rule.support, len(rule.condset)
+
 
 def M1_sort_CARs(car):
     """ Sort the list of generated class association rules in descending order.
-    The order is based on the relation ">" in precendence.
-    Return the sorted rule list. """
-    def compare_rules(r1, r2):
-        """ Compare the rules in CARs based on the article.
-        As we need to choose a set of high precedence rules for the classifier. """
-        if r2.confidence > r1.confidence:     # 1. the confidence of r2 > r1
-            # r2 have higher precendence than r1, meaning r2 > r1
-            return 1
-        elif r1.confidence == r2.confidence:
-            if r2.support > r1.support:       # 2. confidence of r1 and r2 are the same, but support of r2 > r1
-                return 1
-            # if both support and confidence are the same
-            elif r1.support == r2.support:
-                if len(r1.condset) < len(r2.condset):   # 3. but r1 is generated earlier than r2
-                    # r1 have a higher precedence than r2, r1 > r2
-                    return -1
-                elif len(r1.condset) == len(r2.condset):
-                    return 0
-                else:
-                    return 1
-            else:
-                return -1
-        else:
-            return -1
-
+    The order is based on the relation ">" in precendence, then on rulebudget.tie_key (the sorted condset items,
+    then the class label), like the rule budget, so it depends neither on the order the rules were generated in
+    nor on the hash seed.
+    Return the sorted rule list, the index of a rule in the list is its precedence rank. """
     rule_list = list(car.CARs_rule)
-    # sort the list of generated CARs
-    rule_list.sort(key=cmp_to_key(compare_rules))
+    rule_list.sort(key=lambda rule: (precedence_key(rule), rulebudget.tie_key(rule.condset.items(), rule.label)))
     return rule_list
 
 
@@ -105,9 +76,9 @@ class Rule(ruleitem.RuleItem):
     Adding num_label_covered to record the number of times cRule covered each class label
     and replace field.
     """
-    def __init__(self, condset, label, data_list):
+    def __init__(self, condset, label, data_list, sup_counts=None):
         # Inerite the class attributes from RuleItem
-        ruleitem.RuleItem.__init__(self, condset, label, data_list)
+        ruleitem.RuleItem.__init__(self, condset, label, data_list, sup_counts)
         # Add other class attributes
         self._init_num_label_covered(data_list)
         self.replace = set()
@@ -115,171 +86,105 @@ class Rule(ruleitem.RuleItem):
     def _init_num_label_covered(self, data_list):
         """ Initialize the num_label_covered. 
         This is the same as classCasesCovered field in the paper. """
-        # find the label column, which is at the last column
-        label_column = [x[-1] for x in data_list]
-        # find all distinct labels
-        labels = set(label_column)
+        if isinstance(data_list, bitset.BitsetData):
+            labels = data_list.get_labels()
+        else:
+            # find the label column, which is at the last column
+            label_column = [x[-1] for x in data_list]
+            # find all distinct labels
+            labels = set(label_column)
         # build a dictionary for num_label_covered
         self.num_label_covered = dict((label, 0) for label in labels)
 
 
 def ruleitem_to_rule(ruleitem, data_list):
-    """ Convert the ruleitem in RuleItem class to rule in Rule class. """
-    rule = Rule(ruleitem.condset, ruleitem.label, data_list)
+    """ Convert the ruleitem in RuleItem class to rule in Rule class.
+    The ruleitem has been counted on the data_list, so its counts are reused instead of scanning the data_list again. """
+    rule = Rule(ruleitem.condset, ruleitem.label, data_list, (ruleitem.condsupCount, ruleitem.rulesupCount))
     return rule
 
 
-def find_cRule_index(CARs_list, data):
-    """ Stage 1: Find the highest precedence rule cRule (in paper) that correctly classifies data case d
-    from the set of rule having the same class label as d. 
-    This function is the same as 'maxCoverRule' in paper. """
-    CARs_length = len(CARs_list)
-    for index in range(CARs_length):
-        # if they belongs to the same class label
-        if CARs_list[index].label == data[-1]:
-            # check wether the rule in the cars_list cover the single data line
-            if check_cover(data, CARs_list[index]):
-                # if ture, return the index
-                return index
-    return None
-
-
-# finds the highest precedence rule that covers the data case d from the set of rules having the different class as d.
-def find_wRule_index(CARs_list, data):
-    """ Stage 1: Find the highest precedence rule wRule (in paper) that wrongly classifies data case d
-    from the set of rule having the different class label as d. """
-    CARs_length = len(CARs_list)
-    for index in range(CARs_length):
-        # if the have different class label
-        if CARs_list[index].label != data[-1]:
-            # create a temporary data case that without the class label
-            temporary_data = data[:-1]
-            # append the class label in the rule to the temporary data case
-            temporary_data.append(CARs_list[index].label)
-            # if the rule in CARs_list can cover the temporary data line
-            if check_cover(temporary_data, CARs_list[index]):
-                # return the index
-                return index
-    return None
-
-
-def compare_rules(r1, r2):
-    """ Comapre two rules based on precedence.
-    return 1: if r1 > r2
-    return 0: if r1 = r2
-    return -1: if r2 > r1 """
-    if r1 is not None and r2 is None:
-        return 1
-    elif r1 is None and r2 is None:
-        return 0
-    elif r1 is None and r2 is not None:
-        return -1
-    # 1. confidence of r2 > r1, r2 have higher precedence
-    if r2.confidence > r1.confidence:     
-        return -1
-    # 2. confidences are the same
-    elif r1.confidence == r2.confidence:
-        # but support of r2 > r1, r2 have higher precedence
-        if r2.support > r1.support:       
-            return -1
-        # 3. confidence and support are the same, 
-        elif r1.support == r2.support:
-            # but r1 generated earlier than r2, r1 have higher precedence
-            if len(r1.condset) < len(r2.condset):    
-                return 1 
-            # if all conditions are the same, return 0                           
-            elif len(r1.condset) == len(r2.condset):
-                return 0
-            else:
-                return -1
+def find_cRule_wRule_indices(CARs_list, bitset_data):
+    """ Stage 1: Find the cRule and the wRule of every data case at once.
+    The cRule (in paper, 'maxCoverRule') of a data case d is the highest precedence rule that covers d
+    and has the same class label as d, the wRule is the highest precedence rule that covers d with another label.
+    The coverage bitmap of every rule is split into the cases it classifies correctly and wrongly,
+    the cRule (wRule) of a case is the first rule in CARs_list whose correct (wrong) bitmap has the case.
+    Return two lists indexed by the data case, None when there is no such rule. """
+    cRule_indices = [None] * len(bitset_data)
+    wRule_indices = [None] * len(bitset_data)
+    # the cases that have not found their cRule / wRule yet
+    no_cRule = bitset_data.all_cases
+    no_wRule = bitset_data.all_cases
+    for index in range(len(CARs_list)):
+        if not (no_cRule or no_wRule):
+            break
+        rule = CARs_list[index]
+        cover = bitset_data.condset_bitmap(rule.condset)
+        label_bitmap = bitset_data.label_bitmaps.get(rule.label, 0)
+        correct = cover & label_bitmap & no_cRule
+        wrong = cover & ~label_bitmap & no_wRule
+        for data_index in bitset.bitmap_to_positions(correct):
+            cRule_indices[data_index] = index
+        for data_index in bitset.bitmap_to_positions(wrong):
+            wRule_indices[data_index] = index
+        no_cRule &= ~correct
+        no_wRule &= ~wrong
+    return cRule_indices, wRule_indices
+
+
+class RuleIndex:
+    """
+    Index of U (the set of all cRules) for the stage 2, so that find_wSet only examines the rules
+    that have a higher precedence than the cRule and cover the data case, instead of comparing every rule of U.
+    Bit i of the bitmaps is the i-th rule of U in descending order of precedence.
+    """
+    def __init__(self, U, CARs_list):
+        """ rules: the indices of the rules of U in CARs_list (sorted by M1_sort_CARs), in descending order of precedence
+        keys: the ascending keys of the rules, the rules before a key have a higher precedence
+        column_rules: a dictionary {column: bitmap of the rules with a condition on the column}
+        item_rules: a dictionary {(column, value): bitmap of the rules with the condition}
+        label_rules: a dictionary {class label: bitmap of the rules of the class label} """
+        self.rules = sorted(U)
+        self.keys = [precedence_key(CARs_list[index]) for index in self.rules]
+        self.column_rules = dict()
+        self.item_rules = dict()
+        self.label_rules = dict()
+        for position, index in enumerate(self.rules):
+            rule = CARs_list[index]
+            bit = 1 << position
+            for column in rule.condset:
+                self.column_rules[column] = self.column_rules.get(column, 0) | bit
+                item = (column, rule.condset[column])
+                self.item_rules[item] = self.item_rules.get(item, 0) | bit
+            self.label_rules[rule.label] = self.label_rules.get(rule.label, 0) | bit
+
+    def find_wSet(self, data, cRule):
+        """ Stage2: Find all the rules in U that wrongly classify the data line
+        and have higher precedence than that of its cRule (None: every rule of U). """
+        if cRule is None:
+            num_rules = len(self.rules)
         else:
-            return 1
-    else:
-        return 1
-
-
-def find_wSet(U, data, cRule, CARs_list):
-    """ Stage2: Find all the rules in U: the set of all cRules (as stated in the paper)
-    that wrongly classify the data line 
-    and have higher precedence than that of its cRule. """
-    wSet = set()
-    for index in U:
-        # if the rule have higher precedences than cRule
-        if compare_rules(CARs_list[index], cRule) > 0:
-            # and it does not cover the data line
-            if check_cover(data, CARs_list[index]) == False:
-                # add the index
-                wSet.add(index)
-    return wSet
-
-
-def find_label_count(data_list):
-    """ Count the number of data cases in each class label. """
-    # Initialize an empty dictionary
-    label_count = dict()
-    
-    # in the case if there are no data in the data_list
-    if len(data_list) <= 0:
-        label_count = None
-    # can be removed
-    while [] in data_list:
-        data_list.remove([])
-        
-    label_column = [x[-1] for x in data_list]
-    labels = set(label_column)
-    for label in labels:
-        # count the number of each labels and add to the dictionary
-        label_count[label] = label_column.count(label)
-    return label_count
+            # the rules with a higher precedence than the cRule come first
+            num_rules = bisect.bisect_left(self.keys, precedence_key(cRule))
+        candidates = (1 << num_rules) - 1
+        # a rule covers the data line if, on every column it has a condition on, the value is the same
+        for column, rules in self.column_rules.items():
+            if not candidates:
+                break
+            candidates &= ~rules | self.item_rules.get((column, data[column]), 0)
+        # and it classifies the data line wrongly
+        candidates &= ~self.label_rules.get(data[-1], 0)
+        return set(self.rules[position] for position in bitset.bitmap_to_positions(candidates))
 
 
 def M2_sort_CARs(Q, CARs_list):
-    """ Sort the list of generated class association rules in descending order.
+    """ Sort the Q in descending order.
     The order is based on the relation ">" in precendence.
     Return the sorted rule list.
-    Q: the set of cRules that have a higher precedence than their corresponding wRules. """
-    def compare_rules(i, j):
-        # 1. the confidence of rj > ri
-        if CARs_list[j].confidence > CARs_list[i].confidence:
-            return 1
-        # 2. their confidences are the same
-        elif CARs_list[i].confidence == CARs_list[j].confidence:
-            # but support of rj > ri
-            if CARs_list[j].support > CARs_list[i].support:
-                return 1
-            # if both confidence and support are the same
-            elif CARs_list[i].support == CARs_list[j].support:
-                # but ri is generated earlier than rj
-                if len(CARs_list[i].condset) < len(CARs_list[j].condset):
-                    return -1
-                # if all conditions are the same
-                elif len(CARs_list[i].condset) == len(CARs_list[j].condset):
-                    return 0
-                else:
-                    return 1
-            else:
-                return -1
-        else:
-            return -1
-
-    rule_list = list(Q)
-    # sort the rule_list based on precedence
-    rule_list.sort(key=cmp_to_key(compare_rules))
-    return set(rule_list)
-
-
-def count_rule_errors(rule, data_list):
-    """ Count the number of errors that a rule wrongly classify a data line. """
-    num_errors = 0
-    # iterate through each single line of data_list
-    for line in data_list:
-        if line:
-            # check if it correcly classify the data
-            if check_cover(line, rule) == False:
-                # if false, number of errors + 1
-                num_errors += 1
-    return num_errors
-
+    Q: the set of cRules that have a higher precedence than their corresponding wRules.
+    The CARs_list is sorted by M1_sort_CARs, so the index of a rule is its precedence rank. """
+    return sorted(Q)
 
 
 def default_label_selection(label_count):
@@ -315,12 +220,16 @@ def count_default_label_errors(default_label, label_count):
 
 def build_classifier_M2(CARs, data_list):
     """ This is the main function of the M2 classifier that combine everything
-    to build the compelete classifier. """
+    to build the compelete classifier.
+    The CARs must have been generated on the data_list, which is only read,
+    so the same data_list can be used to build several classifiers. """
     classifier_M2 = Classifier_M2()
     CARs_list = M1_sort_CARs(CARs)
     CARs_length = len(CARs_list)
+    # count the rules on the bitmaps of the data_list instead of scanning it for every rule
+    bitset_data = bitset.BitsetData(data_list)
     for index in range(CARs_length):
-        CARs_list[index] = ruleitem_to_rule(CARs_list[index], data_list)
+        CARs_list[index] = ruleitem_to_rule(CARs_list[index], bitset_data)
 
     # Stage 1 in the paper
     # Q is the set of cRules that have a higher precedence than their corresponding wRules
@@ -332,9 +241,11 @@ def build_classifier_M2(CARs, data_list):
     # mark the cRule to indicate it classifies a data case correctly
     mark = set()
     data_size = len(data_list)
+    # the cRule and wRule of every data case, from the coverage bitmaps of the rules
+    cRule_indices, wRule_indices = find_cRule_wRule_indices(CARs_list, bitset_data)
     for data_index in range(data_size):
-        cRule_index = find_cRule_index(CARs_list, data_list[data_index])
-        wRule_index = find_wRule_index(CARs_list, data_list[data_index])
+        cRule_index = cRule_indices[data_index]
+        wRule_index = wRule_indices[data_index]
         if cRule_index is not None:
             # add to U
             U.add(cRule_index)
@@ -344,7 +255,7 @@ def build_classifier_M2(CARs, data_list):
         # if there exist both cRule and wRule,  compare their precedence
         if cRule_index and wRule_index:
             # if cRule have a higher precedence then wRule, cRule > wRule
-            if compare_rules(CARs_list[cRule_index], CARs_list[wRule_index]) == 1:
+            if precedence_key(CARs_list[cRule_index]) < precedence_key(CARs_list[wRule_index]):
                 # add the cRule_index to Q set according to the paper
                 Q.add(cRule_index)
                 # mark the cRule
@@ -359,6 +270,8 @@ def build_classifier_M2(CARs, data_list):
             A.add((data_index, data_list[data_index][-1], cRule_index, wRule_index))
 
     # Stage 2 in the paper
+    # index U by precedence and by item to find the wSets
+    U_index = RuleIndex(U, CARs_list)
     # interate through each collection in A set
     for collection in A:
         # if the wRule is marked, which means it is the cRule of at least once
@@ -377,9 +290,9 @@ def build_classifier_M2(CARs, data_list):
                 # find all the cRules in U that wrongly classify the data case 
                 # and have a higher precedences than that of its cRule
                 # this is also called the allCoverRules() in the paper
-                wSet = find_wSet(U, data_list[collection[0]], CARs_list[collection[2]], CARs_list)
+                wSet = U_index.find_wSet(data_list[collection[0]], CARs_list[collection[2]])
             else:
-                wSet = find_wSet(U, data_list[collection[0]], None, CARs_list)
+                wSet = U_index.find_wSet(data_list[collection[0]], None)
             # iterate each rule w in the wSet
             for rule_w in wSet:
                 # the rule_w may replace cRule to cover the data case as they have higher precedences
@@ -392,57 +305,49 @@ def build_classifier_M2(CARs, data_list):
     # Stage 3 in the paper
     # Choose a set of potential rules to form the classifier_M2
     num_rule_errors = 0
-    data_size = len(data_list)
     # Sort the Q according to relation ">"
     Q = M2_sort_CARs(Q, CARs_list)
-    # Initialize all cover to Flase
-    data_line_covered = list([False] * data_size)
+    # the bitmap of the data cases not covered yet, instead of blanking the covered lines of the data_list
+    alive = bitset_data.all_cases
+    # the number of remaining data cases of each class label, only updated for the cases a rule newly covers
+    label_count = dict((label, bitmap.bit_count()) for label, bitmap in bitset_data.label_bitmaps.items())
     for rule_index in Q:
+        rule = CARs_list[rule_index]
         # If the rule no longer classifies any data cass, we discard it.
         # Otherwise the rule will be used for the classifier_M2.
-        if CARs_list[rule_index].num_label_covered[CARs_list[rule_index].label] != 0:
+        if rule.num_label_covered[rule.label] != 0:
             # the rule will try to replace all the rules in the CARs_list[rule_index].replace
             # as the rule precedess them
-            for entry in CARs_list[rule_index].replace:
+            for entry in rule.replace:
                 # if the data case line has been covered by a previous rule
                 # the current rule will replace previous rule to cover the case
-                if data_line_covered[entry[1]]:
+                if not (alive >> entry[1]) & 1:
                     # update the num_label_covered by the current rule
-                    CARs_list[rule_index].num_label_covered[entry[2]] -= 1
+                    rule.num_label_covered[entry[2]] -= 1
                 else:
                     # the current rule will replace the previous rule to cover the data case line
                     if entry[0] is not None:
                         # update the num_label_covered by the previous rule
                         CARs_list[entry[0]].num_label_covered[entry[2]] -= 1
-            # iterae through each data case line
-            for data_index in range(len(data_list)):
-                data_line = data_list[data_index]
-                if data_line:
-                    is_covered = check_cover(data_line, CARs_list[rule_index])
-                    # if True
-                    if is_covered:
-                        data_list[data_index] = []
-                        # update the covered status to True
-                        data_line_covered[data_index] = True
-            # for each rule, update the number of rule errors
-            num_rule_errors += count_rule_errors(CARs_list[rule_index], data_list)
-            # update the label count
-            label_count = find_label_count(data_list)
-            default_label = default_label_selection(label_count)
+            cover = bitset_data.condset_bitmap(rule.condset) & alive
+            label_bitmap = bitset_data.label_bitmaps.get(rule.label, 0)
+            # the remaining data cases the rule classifies correctly are now covered
+            newly_covered = cover & label_bitmap
+            alive &= ~newly_covered
+            label_count[rule.label] -= newly_covered.bit_count()
+            # for each rule, update the number of rule errors: the remaining data cases it classifies wrongly
+            num_rule_errors += (cover & ~label_bitmap).bit_count()
+            # the default label is chosen among the labels of the remaining data cases
+            remaining_label_count = dict((label, count) for label, count in label_count.items() if count > 0)
+            default_label = default_label_selection(remaining_label_count)
             # count the total number of errors that the selected default label will make
             # in the remainig data_list
-            default_label_errors = count_default_label_errors(default_label, label_count)
+            default_label_errors = count_default_label_errors(default_label, remaining_label_count)
             # calculate total errors that the seleced rules and the default label will make
             total_errors = num_rule_errors + default_label_errors
             # add them to the classifier_M2
-            classifier_M2.rule_insertion(CARs_list[rule_index], default_label, total_errors)
+            classifier_M2.rule_insertion(rule, default_label, total_errors)
     # discard all the rules introduce more errors, and return the final classifier
     classifier_M2.rule_cleaning()
 
     return classifier_M2
-
-
-
-    
-    
-       
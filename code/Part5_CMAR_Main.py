@@ -4,16 +4,27 @@ import preprocessing
 import Part5_FP_Tree
 import Part5_CR_Tree
 import Part5_Classifier
+import fpgrowth
+import rulebudget
 
 import random
 import time
 
 
-def run_FP_classification(data_path, names_path, min_sup, min_conf, coverage_threshold):
-    """ 10-fold cross-validation on CBA-CB-M2 Classifier with rule pruning. """
-    data_list, attributes, attribute_types = readfile.read_files(data_path, names_path)
+def run_FP_classification(data_path, names_path, min_sup, min_conf, coverage_threshold, engine="cmar", columnar=False,
+                          max_candidates=None):
+    """ 10-fold cross-validation on CBA-CB-M2 Classifier with rule pruning.
+    engine: "cmar" for the rule generator in Part5_FP_Tree.py,
+    "fpgrowth" for the FP-growth generator shared with CBA in fpgrowth.py
+    columnar: hold the preprocessed data in a columnar.ColumnarData instead of a data_list (needs NumPy)
+    max_candidates: the maximum number of patterns enumerated for a base attribute by the "cmar" engine,
+    an approximate memory guard (see rulebudget.DEFAULT_MAX_CANDIDATES), None for no limit """
+    columns, missing, attributes, attribute_types = readfile.read_columns(data_path, names_path)
+    data_list = preprocessing.preprocessing_columns(columns, missing, attributes, attribute_types)
     random.shuffle(data_list)
-    data_list = preprocessing.preprocessing_main(data_list, attributes, attribute_types)
+    if columnar:
+        from columnar import to_columnar
+        data_list = to_columnar(data_list)
     data_size = len(data_list)
     # validation_size = data_size / 10 as we are doing 10-fold cross validation
     validation_size = int(data_size / 10)
@@ -38,20 +49,25 @@ def run_FP_classification(data_path, names_path, min_sup, min_conf, coverage_thr
         start_time = time.time()
         new_min_sup = min_sup * len(training_data)
         print(min_sup)
-        f_list= new_FP_Tree.ordered_F_list(training_data, new_min_sup)
-        FP_tree_root, FP_header_table = new_FP_Tree.create_FP_tree(training_data, f_list)
-        temp_CR_tree_root = new_FP_Tree.rule_generator(f_list, FP_header_table, new_min_sup, min_conf, training_data)
-        CRTroot, CR_header_table, num_rules = new_CR_Tree.last_pruning(temp_CR_tree_root, coverage_threshold, training_data)
+        if engine == "fpgrowth":
+            temp_CR_tree_root = fpgrowth.CR_tree_generator(training_data, min_sup, min_conf)
+        else:
+            f_list= Part5_FP_Tree.ordered_F_list(training_data, new_min_sup)
+            FP_tree_root, FP_header_table = Part5_FP_Tree.create_FP_tree(training_data, f_list)
+            budget = rulebudget.RuleBudget(max_candidates=max_candidates)
+            temp_CR_tree_root = Part5_FP_Tree.rule_generator(f_list, FP_header_table, new_min_sup, min_conf, training_data,
+                                                             budget)
+        CRTroot, CR_header_table, num_rules = Part5_CR_Tree.last_pruning(temp_CR_tree_root, coverage_threshold, training_data)
         end_time = time.time()
         rule_gengerator_runtime = end_time - start_time
         rule_gengerator_total_runtime += rule_gengerator_runtime
 
         # compute the error rate and total error rate
-        class_sup_dic, training_data_size = new_Classifier.class_sup_preprocess(training_data)
+        class_sup_dic, training_data_size = Part5_Classifier.class_sup_preprocess(training_data)
         num_errors = 0
         data_size = len(testing_data)
         for row in testing_data:
-            label = new_Classifier.classify(row[:-1:], CRTroot, class_sup_dic, training_data_size)
+            label = Part5_Classifier.classify(row[:-1:], CRTroot, class_sup_dic, training_data_size)
             if label != row[-1]:
                 num_errors += 1
         error_rate = num_errors / data_size
@@ -87,6 +103,8 @@ if __name__ == "__main__":
     min_sup = 0.01
     min_conf = 0.5
     coverage_threshold = 4
+    # the search of wine at min_sup 0.01 does not fit in memory without a limit of the patterns of a base attribute
+    max_candidates = {"wine": 2000}
 
     # total_error_rate = 0
     # total_runtime = 0
@@ -111,7 +129,8 @@ if __name__ == "__main__":
         total_runtime = 0
         total_num_rules = 0
         for i in range(2):
-            error_rate, runtime, num_rules = run_FP_classification(data_path, names_path, min_sup, min_conf, coverage_threshold)
+            error_rate, runtime, num_rules = run_FP_classification(data_path, names_path, min_sup, min_conf, coverage_threshold,
+                                                                   max_candidates=max_candidates.get(f))
             total_error_rate += error_rate
             total_runtime += runtime
             total_num_rules += num_rules
@@ -155,3 +155,25 @@ def last_pruning(CR_tree_root, coverage_threshold, data):
     return newCRTroot, new_CR_header_table, len(result_rules)
 
 
+""" Retrieve all the rules stored in the CR tree """
+""" Return the list of rules: [attri_1, attri_2, ... attri_n, class label, support, confidence, X^2] """
+""" attri_1 ... attri_n are the attributes on the path from the root to the end node of the rule """
+def CRT_rules(CR_tree_root):
+    rule_list = []
+    # DFS: nodes to visit with the path from the root to their parent
+    node_to_vist = []
+    for key, value in CR_tree_root.child.items():
+        node_to_vist.append((value, []))
+    while len(node_to_vist) != 0:
+        cur_node, parent_path = node_to_vist.pop(-1)
+        cur_path = parent_path + [cur_node.attri]
+        if cur_node.label: # end node of a rule
+            rule = cur_path.copy()
+            rule.append(cur_node.label)
+            rule.append(cur_node.support)
+            rule.append(cur_node.confidence)
+            rule.append(cur_node.x2)
+            rule_list.append(rule)
+        for key, value in cur_node.child.items():
+            node_to_vist.append((value, cur_path))
+    return rule_list
@@ -1,3 +1,4 @@
+import rulebudget
 
 """ Assign class label for a data object """
 
@@ -23,54 +24,36 @@ def classify(data_object, CR_tree_root, class_sup_dic, t ):
     # Assign the rules into dictionary: {class label: [rules] }
     # stored rule: [attri_1, attri_2, ... support, X^2]
     rule_dic = {}
-    cur_node = CR_tree_root
-    cur_path = []
+    # DFS: nodes to visit with the path from the root to their parent
     node_to_vist = []
-    for key, value in cur_node.child.items():
-        node_to_vist.append(value)
+    for key, value in CR_tree_root.child.items():
+        node_to_vist.append((value, []))
     while len(node_to_vist) != 0:
-        cur_node = node_to_vist.pop(-1)
-        # If the attribute is not in the data object
+        cur_node, parent_path = node_to_vist.pop(-1)
+        # If the attribute is not in the data object, no rule below the node matches it
         attri = cur_node.attri
         col = attri[0]
         value = attri[1]
         if data_object[col] != value:
-            if len(node_to_vist) == 0: # end the while loop
-                break
-            # reset path to the parent of the next node to visit
-            while node_to_vist[-1].attri not in cur_node.parent.child:
-                cur_node = cur_node.parent
-                cur_path.pop(-1)
             continue
         # Else, current node matches the data object
-        else:
-            # append the current node to the path
-            cur_path.append(cur_node.attri)
-            # If the current node is the end node of a rule
-            if cur_node.label:
-                label = cur_node.label
-                rule = cur_path.copy()
-                rule.append(cur_node.support)
-                rule.append(cur_node.confidence)
-                rule.append(cur_node.x2)
-                # add the rule into the rule dictionary
-                # rule: [attri_1, attri_2, ... support, X^2]
-                if label in rule_dic:
-                    rule_dic[label].append(rule)
-                else:
-                    rule_dic[label] = [rule]
-            # add current node's child into nodes to visit
-            for key, value in cur_node.child.items():
-                node_to_vist.append(value)
-            # If current node is a leaf node
-            if len(cur_node.child) == 0:
-                if len(node_to_vist) == 0: # end the while loop
-                    break
-                cur_path.pop(-1)
-                # reset path to the parent of the next node to visit
-                while node_to_vist[-1].attri not in cur_node.parent.child:
-                    cur_node = cur_node.parent
-                    cur_path.pop(-1)
+        cur_path = parent_path + [cur_node.attri]
+        # If the current node is the end node of a rule
+        if cur_node.label:
+            label = cur_node.label
+            rule = cur_path.copy()
+            rule.append(cur_node.support)
+            rule.append(cur_node.confidence)
+            rule.append(cur_node.x2)
+            # add the rule into the rule dictionary
+            # rule: [attri_1, attri_2, ... support, X^2]
+            if label in rule_dic:
+                rule_dic[label].append(rule)
+            else:
+                rule_dic[label] = [rule]
+        # add current node's child into nodes to visit
+        for key, value in cur_node.child.items():
+            node_to_vist.append((value, cur_path))
 
     # If the data object is not covered by any rule
     # Set the default class as the one with the most count in the training dataset
@@ -102,16 +85,22 @@ def classify(data_object, CR_tree_root, class_sup_dic, t ):
             #         sup_p += base_node_h.count
             #     # get the next base node in the same link from header table
             #     base_node_h = base_node_h.link_next
-            # calculate e
-            e = 1/(sup_c*sup_p) + 1/(sup_p*(t-sup_c)) + 1/(sup_c*(t-sup_p)) + 1/((t-sup_p)*(t-sup_c))
-            # calculate max X^2
-            max_x2 = (min(sup_c, sup_p) - sup_c*sup_p/t)**2 * t * e
             # update weighted X^2
-            x2 = rule[-1]
-            weighted_x2 += x2 ** 2 / max_x2
+            weighted_x2 += rule_weighted_x2(rule[-1], sup_c, sup_p, t)
         # record the weighted X^2 for the class
         class_weighted_x2_dic[label] = weighted_x2
-    # Select the class with the highest weighted X^2
-    result_class = max(class_weighted_x2_dic, key=class_weighted_x2_dic.get)
+    # Select the class with the highest weighted X^2,
+    # the smallest class label (rulebudget.label_key) on equal weighted X^2, like batchscoring.predict_CR_tree
+    result_class = max(sorted(class_weighted_x2_dic, key=rulebudget.label_key), key=class_weighted_x2_dic.get)
     return result_class
 
+""" Calculate the weighted X^2 of a rule P->C: X^2 * X^2 / max X^2 """
+""" x2: X^2 of the rule, sup_c: support count of C, sup_p: support count of P """
+""" t: number of rows in the training dataset """
+def rule_weighted_x2(x2, sup_c, sup_p, t):
+    # calculate e
+    e = 1/(sup_c*sup_p) + 1/(sup_p*(t-sup_c)) + 1/(sup_c*(t-sup_p)) + 1/((t-sup_p)*(t-sup_c))
+    # calculate max X^2
+    max_x2 = (min(sup_c, sup_p) - sup_c*sup_p/t)**2 * t * e
+    return x2 ** 2 / max_x2
+
@@ -1,8 +1,10 @@
 
 from collections import OrderedDict
 
-from preprocessing import test
 import Part5_CR_Tree
+import columnar
+import rulebudget
+import streaming
 
 """ Data structure for FP-Tree """
 class FPTNode:
@@ -24,16 +26,26 @@ dictionary which is below the threshold."""
 
 
 def ordered_F_list(test_data, min_support):
-    col_length = len(test_data[0]) - 1
+    # a streaming.BatchStream is read batch after batch by the loop below
+    if isinstance(test_data, streaming.BatchStream):
+        col_length = test_data.num_columns - 1
+    else:
+        col_length = len(test_data[0]) - 1
     value_count = []
-    for i in range(col_length):
-        value_count.append({})
-    for case in test_data:
+    # a columnar.ColumnarData counts the values of each column at once
+    if isinstance(test_data, columnar.ColumnarData):
         for i in range(col_length):
-            if case[i] in value_count[i]:
-                value_count[i][case[i]] += 1
-            else:
-                value_count[i][case[i]] = 0
+            # the count of a value starts at 0 on its first data case, the same as below
+            value_count.append({value: count - 1 for value, count in test_data.value_count(i).items()})
+    else:
+        for i in range(col_length):
+            value_count.append({})
+        for case in test_data:
+            for i in range(col_length):
+                if case[i] in value_count[i]:
+                    value_count[i][case[i]] += 1
+                else:
+                    value_count[i][case[i]] = 0
     # add attribute values into F_list if their counts >= min_support
     F_list = []
     for i in range(col_length):
@@ -60,7 +72,8 @@ def create_FP_tree(test_data, F_list):
     # create empty header table
     header_table = {}
 
-    # add each data case into the FP tree
+    # add each data case into the FP tree,
+    # a streaming.BatchStream is read batch after batch and only the FP tree is kept in memory
     for case in test_data:
         ordered_case = []
         for e in F_list:
@@ -109,16 +122,22 @@ def update_FP_tree(this_node, case, header_table):
             this_node.child[case[0]].accu_labels[case[1]] = 1
 
 """ Mine frequent patterns using each frequent attribute as the base """
+""" budget: rulebudget.RuleBudget, only the best rules by precedence are added into the CR tree """
 
-def rule_generator(f_list, FP_header_table, min_sup, min_conf, training_data):
-    rule_dic = {}
+def rule_generator(f_list, FP_header_table, min_sup, min_conf, training_data, budget=None):
+    if budget is None:
+        budget = rulebudget.RuleBudget()
     # reversely go through all the attributes in the F_list
     # Get the projected database for the base attribute
     for e in reversed(f_list):
+        # the patterns of a base attribute are only found in its own iteration
+        rule_dic = {}
         attri = (e[0],e[1])
         base_node_h = FP_header_table[attri]
         projected_paths = []
+        base_count = 0
         while base_node_h != None:
+            base_count += base_node_h.count
             path = []
             base_node = base_node_h
             # look upwards and get all the parent nodes until root
@@ -138,6 +157,9 @@ def rule_generator(f_list, FP_header_table, min_sup, min_conf, training_data):
             projected_paths.append(path)
             # get the next base node in the same link from header table
             base_node_h = base_node_h.link_next
+        # no pattern of this base attribute can enter the full rule budget
+        if budget.prunes_branch(base_count, 1):
+            continue
         # Now, all paths for one attribute are retrieved
         # prune infrequent attributes from paths
         freq_attri = OrderedDict()
@@ -183,19 +205,31 @@ def rule_generator(f_list, FP_header_table, min_sup, min_conf, training_data):
                 for node in path:
                     attri_list.append(node[0])
                 # use the function defined below
-                find_patterns(attri_list, base_tuple, label_dic, rule_dic)
-        if len(rule_dic) > 2000:
-            break
-    # for t, dic in rule_dic.items():
-    #     print(t)
-    #     print(dic)
-    #     print()
-
-    # After all the patterns are added into rule_dic
-    # prune the patterns that don't meet min_support or min_confindence
-    # then add the rule into CR tree
+                find_patterns(attri_list, base_tuple, label_dic, rule_dic, budget.max_candidates)
+        add_rules(rule_dic, min_sup, min_conf, training_data, budget)
+    return build_CR_tree(budget)
+
+
+""" Add the rules kept in the budget into CR tree, from the highest precedence """
+""" Also used by the shared FP-growth generator in fpgrowth.py """
+
+def build_CR_tree(budget):
     rule_count = 0
-    CRTroot = new_CR_Tree.CRTNode("CR root", None)
+    CRTroot = Part5_CR_Tree.CRTNode("CR root", None)
+    for rule in budget.get_rules():
+        # add the rule into CR tree
+        CR_header_table = {}
+        Part5_CR_Tree.CRT_add_rule(CRTroot, rule, CR_header_table, True)
+        rule_count += 1
+    #print(rule_count)
+    return CRTroot
+
+
+""" After all the patterns of a base attribute are added into rule_dic,
+    prune the patterns that don't meet min_support or min_confindence,
+    then add the rule into the rule budget """
+
+def add_rules(rule_dic, min_sup, min_conf, training_data, budget):
     for rule_attri_tuple, label_dic in rule_dic.items():
         label = max(label_dic, key=label_dic.get)
         # get support
@@ -209,6 +243,10 @@ def rule_generator(f_list, FP_header_table, min_sup, min_conf, training_data):
         conf = sup / total_count
         if conf < min_conf:
             continue
+        # the effective minimum confidence and support rise as the budget fills
+        tie_key = rulebudget.tie_key(rule_attri_tuple, label)
+        if not budget.admits(conf, sup, len(rule_attri_tuple), tie_key):
+            continue
         rule = list(rule_attri_tuple)
         rule.append(label)
         rule.append(sup)
@@ -217,18 +255,15 @@ def rule_generator(f_list, FP_header_table, min_sup, min_conf, training_data):
         # apply pruning method 2
         if prune_x2(rule, training_data):
             continue
-        # add the rule into CR tree
-        CR_header_table = {}
-        new_CR_Tree.CRT_add_rule(CRTroot, rule, CR_header_table, True)
-        rule_count += 1
-    #print(rule_count)
-    return CRTroot
+        budget.push(rule, conf, sup, len(rule_attri_tuple), tie_key)
 
 
 """ Recursively find frequent patterns for every path """
+""" max_patterns: the maximum number of patterns enumerated for a base attribute, None for no limit.
+    An approximate memory guard: the patterns kept depend on the order of the paths in the FP-tree """
 
-def find_patterns(attri_list, base_tuple, label_dic, rule_dic):
-    if len(rule_dic) > 2000:
+def find_patterns(attri_list, base_tuple, label_dic, rule_dic, max_patterns=None):
+    if max_patterns is not None and len(rule_dic) >= max_patterns:
         return
     for i in range(len(attri_list)):
         rule_attri_list = list(base_tuple)
@@ -245,7 +280,7 @@ def find_patterns(attri_list, base_tuple, label_dic, rule_dic):
 
         if i != 0:
             new_attri_list = attri_list[:i:]
-            find_patterns(new_attri_list, rule_attri_tuple, label_dic, rule_dic)
+            find_patterns(new_attri_list, rule_attri_tuple, label_dic, rule_dic, max_patterns)
 
 
 
@@ -275,29 +310,39 @@ def prune_x2(rule, data):
     total_match_num = 0
     total_miss_num = 0
     total_row_num = len(data)
-    # update the X^2 table for every row of data
-    for row in data:
-        is_match = True
-        for attri in rule[:-3:]:
-            col = attri[0]
-            value = attri[1]
-            if row[col] != value:
-                is_match = False
-                break
-        if is_match:
-            total_match_num += 1
-            if row[-1] not in x2_table:
-                x2_table[row[-1]] = { "match" : 1,
-                                       "miss" : 0}
-            else:
-                x2_table[row[-1]]["match"] += 1
-        else: # data row does not match the rule
-            total_miss_num += 1
-            if row[-1] not in x2_table:
-                x2_table[row[-1]] = { "match" : 0,
-                                       "miss" : 1}
-            else:
-                x2_table[row[-1]]["miss"] += 1
+    # a columnar.ColumnarData fills the X^2 table from the class label counts of the matching rows
+    if isinstance(data, columnar.ColumnarData):
+        match_count = data.label_count(data.condset_mask(dict(rule[:-3:])))
+        for label, count in data.label_count().items():
+            match = match_count.get(label, 0)
+            x2_table[label] = { "match" : match,
+                                "miss" : count - match}
+            total_match_num += match
+            total_miss_num += count - match
+    else:
+        # update the X^2 table for every row of data
+        for row in data:
+            is_match = True
+            for attri in rule[:-3:]:
+                col = attri[0]
+                value = attri[1]
+                if row[col] != value:
+                    is_match = False
+                    break
+            if is_match:
+                total_match_num += 1
+                if row[-1] not in x2_table:
+                    x2_table[row[-1]] = { "match" : 1,
+                                           "miss" : 0}
+                else:
+                    x2_table[row[-1]]["match"] += 1
+            else: # data row does not match the rule
+                total_miss_num += 1
+                if row[-1] not in x2_table:
+                    x2_table[row[-1]] = { "match" : 0,
+                                           "miss" : 1}
+                else:
+                    x2_table[row[-1]]["miss"] += 1
     #print(x2_table)
     # calculate X^2 value
     for label, dic in x2_table.items():
@@ -0,0 +1,104 @@
+"""
+NumPy batch scoring of the CBA and CMAR classifiers.
+Input: a trained classifier and a 2-D NumPy array of test cases, one data case per row,
+integer-encoded like the preprocessed data_list (the class label column may be omitted,
+an object array can be used when some columns keep their string values), or a columnar.ColumnarData
+Output: a NumPy array of the predicted class labels, one per row
+
+The antecedent of every rule is evaluated on the whole batch at once, as a comparison of
+each column it has a condition on, so the cost per rule is a few array operations
+instead of one Python call per data case. NumPy is only needed by this module.
+"""
+
+import numpy
+
+import columnar
+import Part5_CR_Tree
+import Part5_Classifier
+import rulebudget
+
+
+def items_mask(cases, items, item_masks):
+    """ Boolean array of the data cases containing every item (column, value).
+    item_masks: a dictionary {item: boolean array of the data cases containing the item},
+    filled on demand so that each column is compared once per distinct item, not once per rule """
+    mask = numpy.ones(len(cases), dtype=bool)
+    for item in items:
+        if item not in item_masks:
+            if isinstance(cases, columnar.ColumnarData):
+                item_masks[item] = cases.item_mask(item)
+            else:
+                item_masks[item] = cases[:, item[0]] == item[1]
+        mask &= item_masks[item]
+    return mask
+
+
+def as_cases(cases):
+    """ The data cases as a 2-D array, a columnar.ColumnarData or a NumPy array is kept as it is.
+    Rows mixing numbers and strings, e.g. integer-encoded rows with a string class label, would become
+    an array of strings that no integer item is equal to, so they are kept as Python values in an object array. """
+    if isinstance(cases, (columnar.ColumnarData, numpy.ndarray)):
+        return cases
+    array = numpy.asarray(cases)
+    if array.dtype.kind in 'US':
+        return numpy.array(cases, dtype=object)
+    return array
+
+
+def predict_rule_list(classifier, cases):
+    """ Predict the class labels with a rule-list classifier (e.g. CBA_CB_M2.Classifier_M2),
+    the same as predictor.RuleListPredictor: the label of the first rule covering a data case,
+    or the default label. """
+    cases = as_cases(cases)
+    rule_list = classifier.rule_list
+    item_masks = dict()
+    # the rank of the first rule covering each data case, len(rule_list) for the default label
+    first = numpy.full(len(cases), len(rule_list))
+    # the data cases not covered by the rules seen so far
+    remaining = numpy.ones(len(cases), dtype=bool)
+    for rank, rule in enumerate(rule_list):
+        mask = items_mask(cases, rule.condset.items(), item_masks)
+        mask &= remaining
+        first[mask] = rank
+        remaining &= ~mask
+        if not remaining.any():
+            break
+    labels = numpy.array([rule.label for rule in rule_list] + [classifier.default_label])
+    return labels[first]
+
+
+def predict_CR_tree(CR_tree_root, class_sup_dic, t, cases):
+    """ Predict the class labels with a CMAR classifier, the same as Part5_Classifier.classify:
+    the class label with the highest weighted X^2 over the rules covering a data case,
+    or the class label with the most data cases in the training dataset when no rule covers it.
+    The weighted X^2 of each class label is summed over the rules in the same order as classify,
+    so the scores are equal, and the ties are broken by the smallest class label in both.
+    class_sup_dic, t: from Part5_Classifier.class_sup_preprocess of the training dataset """
+    cases = as_cases(cases)
+    # rule: [attri_1, attri_2, ... attri_n, class label, support, confidence, X^2]
+    rules = Part5_CR_Tree.CRT_rules(CR_tree_root)
+    # the class labels of the rules in rulebudget.label_key order, so that argmax breaks the ties of weighted X^2
+    # by the smallest class label, like classify
+    labels = sorted(set(rule[-4] for rule in rules), key=rulebudget.label_key)
+    label_index = dict((label, index) for index, label in enumerate(labels))
+    # the weighted X^2 of each class label for each data case, and whether a rule of the class covers it
+    weighted_x2 = numpy.zeros((len(cases), len(labels)))
+    covered = numpy.zeros((len(cases), len(labels)), dtype=bool)
+    item_masks = dict()
+    for rule in rules:
+        label, support, confidence, x2 = rule[-4:]
+        mask = items_mask(cases, rule[:-4], item_masks)
+        if not mask.any():
+            continue
+        # Rule: P->C, calculate sup(P) = sup(R) / confidence
+        sup_p = round(support / confidence)
+        weight = Part5_Classifier.rule_weighted_x2(x2, class_sup_dic[label], sup_p, t)
+        weighted_x2[mask, label_index[label]] += weight
+        covered[mask, label_index[label]] = True
+    # only the class labels with a rule covering the data case compete
+    scores = numpy.where(covered, weighted_x2, -numpy.inf)
+    default_label = max(class_sup_dic, key=class_sup_dic.get)
+    result = numpy.array(labels + [default_label])
+    best = numpy.argmax(scores, axis=1) if labels else numpy.zeros(len(cases), dtype=int)
+    best[~covered.any(axis=1)] = len(labels)
+    return result[best]
@@ -0,0 +1,82 @@
+"""
+Vertical (bitmap) representation of the preprocessed data_list.
+Input: preprocessed data_list, the last column being the class label
+Output: one bitmap per (column, value) item and one bitmap per class label,
+so that condsupCount and rulesupCount come from bitmap intersections and popcounts
+instead of a scan over every data case.
+"""
+
+import columnar
+
+
+class BitsetData:
+    """
+    Bit i of a bitmap is set when the i-th data case of data_list contains the item (or label).
+    Python integers are used as bitmaps, so the intersection of two bitmaps is "&"
+    and the number of data cases in a bitmap is int.bit_count().
+    """
+    def __init__(self, data_list):
+        """ Scan the data_list once to build the bitmaps.
+        size: the number of data cases
+        item_bitmaps: a dictionary {(column, value): bitmap}
+        label_bitmaps: a dictionary {class label: bitmap}
+        all_cases: the bitmap with every data case set, i.e. the cover of an empty condset """
+        self.size = len(data_list)
+        self.item_bitmaps = dict()
+        self.label_bitmaps = dict()
+        self.all_cases = (1 << self.size) - 1
+        # a columnar.ColumnarData is scanned one column at a time with array operations
+        if isinstance(data_list, columnar.ColumnarData):
+            self.item_bitmaps, self.label_bitmaps = data_list.to_bitmaps()
+            return
+        # collect the bit positions first, then build every bitmap in one go,
+        # setting bits one by one on a large integer is quadratic
+        item_positions = dict()
+        label_positions = dict()
+        for position, data in enumerate(data_list):
+            for column in range(len(data) - 1):
+                item_positions.setdefault((column, data[column]), []).append(position)
+            label_positions.setdefault(data[-1], []).append(position)
+        for item, positions in item_positions.items():
+            self.item_bitmaps[item] = positions_to_bitmap(positions)
+        for label, positions in label_positions.items():
+            self.label_bitmaps[label] = positions_to_bitmap(positions)
+
+    def __len__(self):
+        """ Number of data cases, so that BitsetData can be used where len(data_list) is needed. """
+        return self.size
+
+    def get_labels(self):
+        """ Get all distinct class labels. """
+        return set(self.label_bitmaps)
+
+    def condset_bitmap(self, condset):
+        """ Intersect the bitmaps of every item in the condset. """
+        bitmap = self.all_cases
+        for column in condset:
+            bitmap &= self.item_bitmaps.get((column, condset[column]), 0)
+            if not bitmap:
+                break
+        return bitmap
+
+    def count(self, condset, label):
+        """ Count the condsupCount and rulesupCount of a ruleitem. """
+        bitmap = self.condset_bitmap(condset)
+        condsupCount = bitmap.bit_count()
+        rulesupCount = (bitmap & self.label_bitmaps.get(label, 0)).bit_count()
+        return condsupCount, rulesupCount
+
+
+def positions_to_bitmap(positions):
+    """ Build a bitmap with the bits at the given positions set. """
+    bitmap = bytearray((positions[-1] >> 3) + 1)
+    for position in positions:
+        bitmap[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bitmap, 'little')
+
+
+def bitmap_to_positions(bitmap):
+    """ List the positions of the set bits in a bitmap, in ascending order. """
+    # the binary string is read from the lowest bit, this is much faster than clearing the bits one by one
+    binary = bin(bitmap)[:1:-1]
+    return [position for position, bit in enumerate(binary) if bit == '1']
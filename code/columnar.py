@@ -0,0 +1,187 @@
+"""
+Columnar (integer-encoded) representation of the preprocessed data_list.
+Input: preprocessed data_list, the last column being the class label
+Output: an int32 matrix of the codes of the items of the data cases, the int32 vector of the codes of their
+class labels, and the dictionary of each column mapping its values to dense codes 0, 1, 2, ...
+
+The dataset is held in two NumPy arrays instead of one list and one boxed Python object per value, and the data
+cases containing an item, or the class label counts of a set of data cases, are computed with array operations
+on a whole column. ColumnarData is also a sequence of data cases like the data_list (len, indexing, slicing,
+iteration and +), so the miners, classifiers and scorers accept it wherever they accept the data_list.
+NumPy is only needed by this module, and only to build a ColumnarData: without NumPy the module is still
+imported, so the other modules can check isinstance(data, ColumnarData), and AVAILABLE is False.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# whether a ColumnarData can be built, i.e. NumPy is installed
+AVAILABLE = numpy is not None
+
+# number of data cases decoded at once when iterating over a ColumnarData
+DECODE_BLOCK_SIZE = 4096
+
+
+class ColumnarData:
+    """
+    items: int32 array (number of data cases, number of attribute columns) in column-major order,
+    items[i, column] is the code of the value of the i-th data case in the column
+    labels: int32 array of the codes of the class labels of the data cases
+    column_values: list of the values of each column, indexed by code, i.e. the dictionary of the column
+    column_codes: list of dictionaries {value: code}, the inverse of column_values
+    label_values, label_codes: the same for the class labels
+    The dictionaries are shared by the slices and the concatenations of a ColumnarData, and never modified.
+    """
+    def __init__(self, items, labels, column_values, column_codes, label_values, label_codes):
+        self.items = items
+        self.labels = labels
+        self.column_values = column_values
+        self.column_codes = column_codes
+        self.label_values = label_values
+        self.label_codes = label_codes
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, index):
+        """ A data case as a list, like a row of the data_list, or a ColumnarData of the data cases of a slice. """
+        if isinstance(index, slice):
+            return ColumnarData(self.items[index], self.labels[index], self.column_values, self.column_codes,
+                                self.label_values, self.label_codes)
+        row = [values[code] for values, code in zip(self.column_values, self.items[index].tolist())]
+        row.append(self.label_values[self.labels[index]])
+        return row
+
+    def __iter__(self):
+        """ Iterate over the data cases as lists, decoding a block of data cases at a time. """
+        for start in range(0, len(self), DECODE_BLOCK_SIZE):
+            yield from self.decode(start, start + DECODE_BLOCK_SIZE)
+
+    def __add__(self, other):
+        """ Concatenate the data cases of two ColumnarData, like two data_list. """
+        if not isinstance(other, ColumnarData):
+            return NotImplemented
+        if other.column_values is not self.column_values or other.label_values is not self.label_values:
+            # encoded with other dictionaries
+            return to_columnar(list(self) + list(other))
+        items = numpy.asfortranarray(numpy.concatenate((self.items, other.items)))
+        labels = numpy.concatenate((self.labels, other.labels))
+        return ColumnarData(items, labels, self.column_values, self.column_codes, self.label_values, self.label_codes)
+
+    def decode(self, start, stop):
+        """ The data cases from start to stop as a list of lists, like a slice of the data_list. """
+        columns = []
+        for column, values in enumerate(self.column_values):
+            columns.append([values[code] for code in self.items[start:stop, column].tolist()])
+        columns.append([self.label_values[code] for code in self.labels[start:stop].tolist()])
+        return [list(row) for row in zip(*columns)]
+
+    def get_labels(self):
+        """ Get all distinct class labels. """
+        return set(self.label_values[code] for code in numpy.unique(self.labels).tolist())
+
+    def item_mask(self, item):
+        """ Boolean array of the data cases containing the item (column, value). """
+        column, value = item
+        code = self.column_codes[column].get(value)
+        if code is None:
+            return numpy.zeros(len(self), dtype=bool)
+        return self.items[:, column] == code
+
+    def condset_mask(self, condset):
+        """ Boolean array of the data cases containing every item of the condset. """
+        mask = numpy.ones(len(self), dtype=bool)
+        for column in condset:
+            mask &= self.item_mask((column, condset[column]))
+        return mask
+
+    def count(self, condset, label):
+        """ Count the condsupCount and rulesupCount of a ruleitem. """
+        mask = self.condset_mask(condset)
+        condsupCount = int(numpy.count_nonzero(mask))
+        code = self.label_codes.get(label)
+        if code is None:
+            return condsupCount, 0
+        rulesupCount = int(numpy.count_nonzero(self.labels[mask] == code))
+        return condsupCount, rulesupCount
+
+    def value_count(self, column):
+        """ The dictionary {value: number of data cases} of a column, in the order the values first appear. """
+        return code_count(self.items[:, column], self.column_values[column])
+
+    def label_count(self, mask=None):
+        """ The dictionary {class label: number of data cases} of the data cases in the mask (of every data case
+        when mask is None), in the order the class labels first appear. """
+        labels = self.labels if mask is None else self.labels[mask]
+        return code_count(labels, self.label_values)
+
+    def distinct_cases(self):
+        """ The distinct data cases without their class label, each with the dictionary {class label: count}
+        of the data cases equal to it, as a list of (list of values, {class label: count}). """
+        rows = numpy.column_stack((self.items, self.labels))
+        unique_rows, counts = numpy.unique(rows, axis=0, return_counts=True)
+        distinct_cases = dict()
+        for row, count in zip(unique_rows.tolist(), counts.tolist()):
+            distinct_cases.setdefault(tuple(row[:-1]), dict())[self.label_values[row[-1]]] = count
+        return [([values[code] for values, code in zip(self.column_values, codes)], label_count)
+                for codes, label_count in distinct_cases.items()]
+
+    def to_bitmaps(self):
+        """ The bitmaps of bitset.BitsetData: a dictionary {(column, value): bitmap} and a dictionary
+        {class label: bitmap}, the class labels in the order they first appear. """
+        item_bitmaps = dict()
+        for column, values in enumerate(self.column_values):
+            for code, bitmap in codes_to_bitmaps(self.items[:, column]).items():
+                item_bitmaps[(column, values[code])] = bitmap
+        label_bitmaps = dict((self.label_values[code], bitmap)
+                             for code, bitmap in codes_to_bitmaps(self.labels).items())
+        return item_bitmaps, label_bitmaps
+
+
+def first_appearance(codes):
+    """ The distinct codes of an array, in the order they first appear. """
+    unique, first = numpy.unique(codes, return_index=True)
+    return unique[numpy.argsort(first)].tolist()
+
+
+def code_count(codes, values):
+    """ The dictionary {value: number of occurrences} of an array of codes, in the order the values first appear. """
+    counts = numpy.bincount(codes, minlength=len(values))
+    return dict((values[code], int(counts[code])) for code in first_appearance(codes))
+
+
+def codes_to_bitmaps(codes):
+    """ The dictionary {code: bitmap of the positions of the code}, in the order the codes first appear. """
+    bitmaps = dict()
+    for code in first_appearance(codes):
+        packed = numpy.packbits(codes == code, bitorder='little')
+        bitmaps[code] = int.from_bytes(packed.tobytes(), 'little')
+    return bitmaps
+
+
+def encode_column(column_data):
+    """ Encode the values of a column with dense codes, in the order the values first appear.
+    Return the int32 array of codes, the list of values indexed by code and the dictionary {value: code}. """
+    codes = dict()
+    encoded = numpy.fromiter((codes.setdefault(value, len(codes)) for value in column_data),
+                             dtype=numpy.int32, count=len(column_data))
+    return encoded, list(codes), codes
+
+
+def to_columnar(data_list):
+    """ Encode a preprocessed data_list, the last column being the class label, into a ColumnarData.
+    The data_list is read column by column and can be released afterwards. """
+    if not AVAILABLE:
+        raise ImportError("to_columnar needs NumPy")
+    num_columns = len(data_list[0]) - 1 if data_list else 0
+    items = numpy.empty((len(data_list), num_columns), dtype=numpy.int32, order='F')
+    column_values = []
+    column_codes = []
+    for column in range(num_columns):
+        items[:, column], values, codes = encode_column([data[column] for data in data_list])
+        column_values.append(values)
+        column_codes.append(codes)
+    labels, label_values, label_codes = encode_column([data[-1] for data in data_list])
+    return ColumnarData(items, labels, column_values, column_codes, label_values, label_codes)
@@ -0,0 +1,42 @@
+"""
+Shared helpers of the test modules: the paths of the bundled datasets, their preprocessed data_list,
+and the data_list fixture of the small datasets (iris, caesarian).
+"""
+
+import os
+
+import pytest
+
+import preprocessing
+import readfile
+import ruleitem
+
+DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dataset')
+SMALL_DATASETS = ["iris", "caesarian"]
+
+
+def dataset_paths(name):
+    """ The paths of the .data and .names files of a bundled dataset. """
+    return os.path.join(DATASET, name + '.data'), os.path.join(DATASET, name + '.names')
+
+
+def read_raw_dataset(name):
+    """ The data_list, attributes and attribute types of a bundled dataset, before preprocessing. """
+    return readfile.read_files(*dataset_paths(name))
+
+
+def read_dataset(name, encoding=None):
+    """ The preprocessed data_list of a bundled dataset, encoding: filled like preprocessing_main. """
+    data_list, attributes, attribute_types = read_raw_dataset(name)
+    return preprocessing.preprocessing_main(data_list, attributes, attribute_types, encoding)
+
+
+def rule_set(cars):
+    """ The rules of a CARs with their counts, comparable across the rule generators. """
+    return set((ruleitem.condset_key(rule.condset), rule.label, rule.condsupCount, rule.rulesupCount)
+               for rule in cars.CARs_rule)
+
+
+@pytest.fixture(scope="module", params=SMALL_DATASETS)
+def data_list(request):
+    return read_dataset(request.param)
@@ -1,5 +1,9 @@
+import bisect
 import math
 
+# the minimum number of data cases of a sub-block split by another worker in complete_split
+PARALLEL_BLOCK_SIZE = 5000
+
 class DataBlock:
 	def __init__(self, data):
 		""" Define a block to be split
@@ -28,8 +32,9 @@ def calculate_entropy(data):
 		# count the number of data case for each class label
         label_count[data_case[1]] += 1              
     entropy = 0
-    for label in labels:
-        probability = label_count[label] / data_size
+    # in ascending order of count, so that the entropy does not depend on the order of the labels
+    for count in sorted(label_count.values()):
+        probability = count / data_size
         # calculate information entropy by its formula, where the base of log is 2
         entropy = entropy - probability * math.log2(probability)         
     return entropy
@@ -65,85 +70,315 @@ def calculate_minimum_gain(original_datablock, left_datablock, right_datablock):
     return minimum_gain
 
 
-def binary_split(original_datablock):
+class CountBlock:
+    """ Summary of a block of data cases computed from its class label counts, without the data table.
+    It has the members of DataBlock used by calculate_entropy_gain and calculate_minimum_gain:
+    size, label_size and entropy. """
+    def __init__(self, label_count, size):
+        self.size = size
+        # the number of classes with at least one data case in the block
+        self.label_size = 0
+        self.entropy = 0
+        # in ascending order of count, like calculate_entropy, so that both give the same entropy
+        for count in sorted(label_count.values()):
+            if count > 0:
+                self.label_size += 1
+                probability = count / size
+                self.entropy = self.entropy - probability * math.log2(probability)
+
+
+def binary_split(original_datablock, boundary_only=False):
     """ Identify the best acceptable value to split the datablock
         datablock: a block of dataset
         Return value: a list of (boundary, entropy gain, left datablock, right datablock) or
-        Return "None" when it's unnecessary to split. """
-    # create a list of values that have the potential to be splitting boundary    
-    candidates_boundaries = [x[0] for x in original_datablock.data] 
-    # get distinct values in the list    
-    candidates_boundaries = list(set(candidates_boundaries)) 
-    # sort the values in ascending order        	
-    candidates_boundaries.sort()  
-    # remove the smallest value, because by definition no value is smaller                         
-    candidates_boundaries = candidates_boundaries[1:]                 
-
-	# split_point will be used to store sorted final boundary
-    split_point = []     
-    # test every cantidate if the entropy gain has met the minimum requirement  
-    for value in candidates_boundaries:        
-        # split the data block into 2 parts, left & right data block
-        left = []
-        right = []
-        # split by data case into 2 groups, below & above the value
-        for data in original_datablock.data:
-            if data[0] < value:
-                left.append(data)
-            else:
-                right.append(data)
-        left_datablock = DataBlock(left)
-        right_datablock = DataBlock(right)
-		# calculate the entropy gain by splitting the datablock
-        entropy_gain = calculate_entropy_gain(original_datablock, left_datablock, right_datablock)
+        Return "None" when it's unnecessary to split.
+        The data cases are sorted once, then the class label counts below every candidate value
+        are accumulated, so each candidate is evaluated from the counts without splitting the data.
+        boundary_only: only evaluate the boundary points. As shown by Fayyad & Irani (1993), the cut with the maximum
+        entropy gain is never between two values whose data cases all have the same class label, but the best cut
+        passing the minimum gain requirement may be, e.g. in a block of 2 data cases of the same class label,
+        so the split points may differ from those of every distinct value (the default). """
+    # sort the data cases in ascending order of value
+    sorted_data = sorted(original_datablock.data, key=lambda x: x[0])
+    data_size = len(sorted_data)
+    # the class label counts of the whole block, and below the current candidate value
+    label_count = dict()
+    for data in sorted_data:
+        label_count[data[1]] = label_count.get(data[1], 0) + 1
+    left_count = dict((label, 0) for label in label_count)
+
+    # group the data cases by distinct value: [index of the first data case, the class label of all
+    # the data cases of the value, or None when they have different class labels]
+    groups = []
+    for index in range(data_size):
+        if index == 0 or sorted_data[index][0] != sorted_data[index - 1][0]:
+            groups.append([index, sorted_data[index][1]])
+        elif groups[-1][1] != sorted_data[index][1]:
+            groups[-1][1] = None
+
+    # the best candidate so far: [value, entropy gain, number of data cases below the value]
+    best_split = None
+    # test every distinct value but the smallest one, as by definition no value is smaller
+    for group in range(1, len(groups)):
+        index = groups[group][0]
+        for data in sorted_data[groups[group - 1][0]:index]:
+            left_count[data[1]] += 1
+        # not a boundary point: the values on both sides have the same single class label
+        if boundary_only and groups[group - 1][1] is not None and groups[group - 1][1] == groups[group][1]:
+            continue
+        value = sorted_data[index][0]
+        # the blocks below & above the value
+        left_block = CountBlock(left_count, index)
+        right_block = CountBlock(dict((label, label_count[label] - left_count[label]) for label in label_count),
+                                 data_size - index)
+        # calculate the entropy gain by splitting the datablock
+        entropy_gain = calculate_entropy_gain(original_datablock, left_block, right_block)
         # calculate the minimum gain requirement
-        minimum_requirement = calculate_minimum_gain(original_datablock, left_datablock, right_datablock)
+        minimum_requirement = calculate_minimum_gain(original_datablock, left_block, right_block)
 
         # if entropy gain is greater than or equal to the minimum gain requirement
-        # the value is an acceptable candidate for boundary
-        if entropy_gain >= minimum_requirement:
-			 # append the list of value to the wall
-            split_point.append([value, entropy_gain, left_datablock, right_datablock])  
-
-    if split_point:    # is not empty
-		# sort the value in aescending order by "entropy_gain"
-        split_point.sort(key=lambda wall: wall[1]) 
-        # return best value with maximum entropy gain  
-        return split_point[-1]      
+        # the value is an acceptable candidate for boundary,
+        # keep the one with the maximum entropy gain (the largest value on equal gain)
+        if entropy_gain >= minimum_requirement and (best_split is None or entropy_gain >= best_split[1]):
+            best_split = [value, entropy_gain, index]
+
+    if best_split:    # is not empty
+        # split the data block into 2 parts, left & right data block
+        value, entropy_gain, index = best_split
+        return [value, entropy_gain, DataBlock(sorted_data[:index]), DataBlock(sorted_data[index:])]
     else:
-		# there's no need to split the data
-        return None         
+        # there's no need to split the data
+        return None
 
 
 
-def complete_split(original_datablock):
+def complete_split(original_datablock, executor=None, parallel_size=PARALLEL_BLOCK_SIZE, boundary_only=False):
     """ Recursively split a data block
-		Append boundary obtained into 'split_points' in each iteration """
+		Append boundary obtained into 'split_points' in each iteration
+		executor: a concurrent.futures executor, the sub-blocks of at least parallel_size data cases
+		are then split by its workers while the rest of the recursion goes on,
+		the split points are the same as without executor
+		boundary_only: only evaluate the boundary points, see binary_split """
     split_points = []
+    # the split points of the sub-blocks split by the executor
+    futures = []
     
     def recursive_split(original_datablock):
         """ inner recursive function, accumulate the partitioning values: walls """
         # binary partition, to get left and right datablock
-        split_point = binary_split(original_datablock)        
+        split_point = binary_split(original_datablock, boundary_only)        
         if split_point:        # there's a wall returned, dabablock can still can be spilt
-			# record this partitioning value: the best candidate with maximum entropy gain
+            # record this partitioning value: the best candidate with maximum entropy gain
             split_points.append(split_point[0])    
-            # recursively process the spllitting of left datablock  
-            recursive_split(split_point[2])
-            # recursively split right datablock   
-            recursive_split(split_point[3])   
+            # recursively process the spllitting of left datablock, then right datablock
+            for datablock in (split_point[2], split_point[3]):
+                if executor is not None and datablock.size >= parallel_size:
+                    futures.append(executor.submit(complete_split, datablock, None, parallel_size, boundary_only))
+                else:
+                    recursive_split(datablock)
         else:
-			# nothing to split, end of recursion
+            # nothing to split, end of recursion
             return None                          
             
     recursive_split(original_datablock)
+    for future in futures:
+        split_points.extend(future.result())
     # sort the boundaries in aescending order
     split_points.sort()                
     return split_points
-    
 
-    
-    
 
+# approximate memory of a bin of a StreamingHistogram in bytes
+BIN_SIZE = 330
+# default maximum number of bins of a StreamingHistogram: with the pending values, a column holds at most
+# 2 x max_bins bins, about 2.7 MB
+DEFAULT_MAX_BINS = 1 << 12
+# default memory cap in bytes of the histograms of all the numerical columns together, see max_bins_per_column
+DEFAULT_MAX_MEMORY = 64 << 20
+# the fewest bins a column is given under the memory cap
+MIN_BINS = 64
+# number of distinct values added to a StreamingHistogram before they are merged into its bins
+PENDING_SIZE = 1024
+
+
+class StreamingHistogram:
+    """ Bounded-memory summary of a numerical column and its class labels, built in one pass over the data.
+    bins: sorted, disjoint value ranges [lowest value, highest value, {class label: count}].
+    The bins grow with the distinct values of the column, every bin holding a single value, up to max_bins bins.
+    Beyond that, adjacent bins are merged: first the neighbours whose data cases all have the same class label,
+    which loses no boundary point, then, only when that is not enough, neighbours of about equal frequency
+    (quantile bins).
+    exact: True while every bin holds a single value or a run of values of a single class label,
+    i.e. every boundary point of the column is a bin edge, see complete_split_histogram.
+    It becomes False on a quantile merge, or when a value of another class label falls inside a merged bin.
+    max_shift gives the tolerance of the split points of the histogram. """
+    def __init__(self, max_bins=DEFAULT_MAX_BINS):
+        self.max_bins = max_bins
+        self.bins = []
+        self.exact = True
+        # {value: {class label: count}} of the values added since the last flush
+        self.pending = dict()
+
+    def add(self, value, label):
+        """ Add a data case. """
+        label_count = self.pending.setdefault(value, dict())
+        label_count[label] = label_count.get(label, 0) + 1
+        if len(self.pending) >= min(PENDING_SIZE, self.max_bins):
+            self.flush()
+
+    def flush(self):
+        """ Merge the pending values into the bins, then compress the bins to max_bins. """
+        if not self.pending:
+            return
+        lows = [b[0] for b in self.bins]
+        new_bins = []
+        for value in sorted(self.pending):
+            label_count = self.pending[value]
+            # a value inside the range of a merged bin is counted in that bin, so that bins stay disjoint
+            position = bisect.bisect_right(lows, value) - 1
+            if position >= 0 and value <= self.bins[position][1]:
+                bin_count = self.bins[position][2]
+                # the bin then has data cases of several class labels inside its range: a boundary point is lost
+                if self.bins[position][0] < self.bins[position][1] and label_count.keys() != bin_count.keys():
+                    self.exact = False
+                for label, count in label_count.items():
+                    bin_count[label] = bin_count.get(label, 0) + count
+            else:
+                new_bins.append([value, value, label_count])
+        self.pending = dict()
+        self.bins = sorted(self.bins + new_bins, key=lambda b: b[0])
+        if len(self.bins) > self.max_bins:
+            self.compress(self.max_bins // 2)
+
+    def compress(self, target):
+        """ Merge adjacent bins until there are at most max_bins bins, and at most target bins
+        when the bins of a single class label are not enough. """
+        # lossless: merge the neighbours whose data cases all have the same class label
+        merged = []
+        for b in self.bins:
+            if merged and len(b[2]) == 1 and merged[-1][2].keys() == b[2].keys():
+                merge_bins(merged[-1], b)
+            else:
+                merged.append(b)
+        self.bins = merged
+        if len(self.bins) <= self.max_bins:
+            return
+        # quantile: merge the neighbours into bins of about total / target data cases
+        self.exact = False
+        total = sum(sum(b[2].values()) for b in self.bins)
+        bin_size = total / target
+        merged = []
+        filled = 0
+        for b in self.bins:
+            count = sum(b[2].values())
+            if merged and filled + count <= bin_size:
+                merge_bins(merged[-1], b)
+                filled += count
+            else:
+                merged.append([b[0], b[1], dict(b[2])])
+                filled = count
+        self.bins = merged
+
+    def get_bins(self):
+        """ Return the bins, after merging the pending values. """
+        self.flush()
+        return self.bins
+
+    def max_shift(self, boundary_only=False):
+        """ Return the largest number of data cases of a bin that may hide a candidate cut of complete_split,
+        i.e. a bin of several values, 0 while every bin holds a single value.
+        boundary_only: for complete_split(boundary_only=True), only count the bins of several values
+        and several class labels, then 0 while the histogram is exact.
+        The class label counts below every bin edge are exact, so every candidate cut of complete_split
+        is at most max_shift() data cases, in the sorted order of the column, away from a bin edge.
+        A quantile merge only makes bins of at most 2 x n / max_bins of the n data cases added so far,
+        the data cases added later into the range of a merged bin add to it. """
+        return max([sum(b[2].values()) for b in self.get_bins()
+                    if b[0] < b[1] and (len(b[2]) > 1 or not boundary_only)], default=0)
+
+
+def max_bins_per_column(num_columns, max_bins=DEFAULT_MAX_BINS, max_memory=DEFAULT_MAX_MEMORY):
+    """ Return the maximum number of bins of the StreamingHistogram of each of num_columns numerical columns,
+    at most max_bins, such that the histograms take at most max_memory bytes together (None for no cap).
+    A column is given at least MIN_BINS bins. """
+    if max_memory is None or num_columns == 0:
+        return max_bins
+    return max(MIN_BINS, min(max_bins, max_memory // (2 * BIN_SIZE * num_columns)))
+
+
+def merge_bins(left_bin, right_bin):
+    """ Merge right_bin into the adjacent left_bin. """
+    left_bin[1] = right_bin[1]
+    for label, count in right_bin[2].items():
+        left_bin[2][label] = left_bin[2].get(label, 0) + count
 
 
+class HistogramBlock:
+    """ A block to be split made of histogram bins, with the members of DataBlock:
+    bins: the bins of StreamingHistogram in the block;
+    size: number of data case in the block;
+    label_size: the number of distinct class in the block;
+    entropy: calculated entropy of the block. """
+    def __init__(self, bins):
+        self.bins = bins
+        label_count = dict()
+        for b in bins:
+            for label, count in b[2].items():
+                label_count[label] = label_count.get(label, 0) + count
+        self.label_count = label_count
+        summary = CountBlock(label_count, sum(label_count.values()))
+        self.size = summary.size
+        self.label_size = summary.label_size
+        self.entropy = summary.entropy
+
+
+def binary_split_histogram(original_block, boundary_only=False):
+    """ binary_split over the bins of a HistogramBlock: the candidates are the lowest values of the bins
+        but the first one.
+        boundary_only: skip the edges between bins whose data cases all have the same class label. """
+    bins = original_block.bins
+    left_count = dict((label, 0) for label in original_block.label_count)
+    left_size = 0
+    best_split = None
+    for index in range(1, len(bins)):
+        for label, count in bins[index - 1][2].items():
+            left_count[label] += count
+            left_size += count
+        # not a boundary point
+        if boundary_only and len(bins[index - 1][2]) == 1 and bins[index - 1][2].keys() == bins[index][2].keys():
+            continue
+        left_block = CountBlock(left_count, left_size)
+        right_block = CountBlock(dict((label, original_block.label_count[label] - left_count[label])
+                                      for label in left_count), original_block.size - left_size)
+        entropy_gain = calculate_entropy_gain(original_block, left_block, right_block)
+        minimum_requirement = calculate_minimum_gain(original_block, left_block, right_block)
+        if entropy_gain >= minimum_requirement and (best_split is None or entropy_gain >= best_split[1]):
+            best_split = [bins[index][0], entropy_gain, index]
+    if best_split:
+        value, entropy_gain, index = best_split
+        return [value, entropy_gain, HistogramBlock(bins[:index]), HistogramBlock(bins[index:])]
+    return None
+
+
+def complete_split_histogram(histogram, boundary_only=False):
+    """ complete_split over the bins of a StreamingHistogram.
+        When histogram.max_shift(boundary_only) is 0, the split points are exactly those of complete_split
+        on the data cases with the same boundary_only: every candidate cut is a bin edge and the bins hold
+        the exact class label counts, so binary_split_histogram evaluates the same candidates from the same counts
+        as binary_split. With boundary_only, this holds while histogram.exact is True.
+        Otherwise the candidate cuts are restricted to the bin edges and the split points are approximate:
+        the best cut of complete_split may fall inside a bin, at most histogram.max_shift(boundary_only)
+        data cases away from the nearest bin edge evaluated here.
+        Once a split differs, the recursion divides other blocks, so the later split points may differ more. """
+    split_points = []
+
+    def recursive_split(block):
+        split_point = binary_split_histogram(block, boundary_only)
+        if split_point:
+            split_points.append(split_point[0])
+            recursive_split(split_point[2])
+            recursive_split(split_point[3])
+
+    recursive_split(HistogramBlock(histogram.get_bins()))
+    split_points.sort()
+    return split_points
@@ -0,0 +1,82 @@
+"""
+Vertical rule generator (Eclat):
+Input: preprocessed data, minimum support and minimum confidence
+Output: Class Association Rules (CARs), like rulegenerator.rule_generator_main (see rule_generator_eclat)
+
+The condsets are searched depth-first in canonical order (sorted by column).
+Every condset keeps its tidset, the bitmap of the data cases it covers, split by class label,
+so extending a condset by an item is a bitmap intersection instead of a pass over the data_list.
+"""
+
+import bitset
+import ruleitem
+import rulebudget
+import rulegenerator
+
+
+def extend_condsets(prefix, extensions, bitset_data, min_support, min_confidence, all_CARs):
+    """ Depth-first search of the condsets starting with prefix.
+    extensions: list of (item, cover, label_covers) for the frequent extensions prefix + (item,) in canonical order,
+    where cover is the tidset of the condset and label_covers is {class label: tidset of the ruleitem}
+    for the labels the ruleitem is frequent with. """
+    data_size = len(bitset_data)
+    for index in range(len(extensions)):
+        item, cover, label_covers = extensions[index]
+        key = prefix + (item,)
+        condsupCount = cover.bit_count()
+        for label, label_cover in label_covers.items():
+            sup_counts = (condsupCount, label_cover.bit_count())
+            all_CARs.count_cache.add(key, label, sup_counts[0], sup_counts[1])
+            rule_item = ruleitem.RuleItem(dict(key), label, bitset_data, sup_counts)
+            all_CARs.add_CARs_rule(rule_item, min_support, min_confidence)
+        # join with the following extensions of the same prefix, like the prefix join of Apriori-gen
+        new_extensions = []
+        for other_item, other_cover, other_label_covers in extensions[index + 1:]:
+            # the same attribute cannot take two values
+            if other_item[0] == item[0]:
+                continue
+            new_label_covers = dict()
+            for label, label_cover in label_covers.items():
+                # both k-subsets sharing the prefix have to be frequent with the label
+                if label not in other_label_covers:
+                    continue
+                new_label_cover = label_cover & other_label_covers[label]
+                support = new_label_cover.bit_count() / data_size
+                if support < min_support:
+                    continue
+                # no rule extending this ruleitem can enter the full rule budget
+                if all_CARs.budget.prunes_branch(support, len(key) + 1):
+                    continue
+                new_label_covers[label] = new_label_cover
+            if new_label_covers:
+                new_extensions.append((other_item, cover & other_cover, new_label_covers))
+        if new_extensions:
+            extend_condsets(key, new_extensions, bitset_data, min_support, min_confidence, all_CARs)
+
+
+# main function to run the vertical rule generator
+def rule_generator_eclat(data_list, min_support, min_confidence,
+                         max_rules=rulebudget.DEFAULT_MAX_RULES, max_memory=None):
+    """ max_rules, max_memory: the rule budget, only the best rules by precedence are kept (None for no limit).
+    The frequent ruleitems are the same as those of the level-wise rule_generator_main, so both return the same CARs
+    when rule_generator_main does not limit its candidates (max_candidates None, the default). """
+    budget = rulebudget.RuleBudget(max_rules, max_memory, None)
+    count_cache = rulegenerator.CountCache(data_list)
+    all_CARs = rulegenerator.CARs(budget, count_cache)
+    # tidsets of every item and every class label
+    bitset_data = bitset.BitsetData(data_list)
+    count_cache.bitset_data = bitset_data
+
+    # frequent 1-ruleitems, in canonical order
+    extensions = []
+    for item in sorted(bitset_data.item_bitmaps):
+        cover = bitset_data.item_bitmaps[item]
+        label_covers = dict()
+        for label, label_bitmap in bitset_data.label_bitmaps.items():
+            label_cover = cover & label_bitmap
+            if label_cover.bit_count() / len(bitset_data) >= min_support:
+                label_covers[label] = label_cover
+        if label_covers:
+            extensions.append((item, cover, label_covers))
+    extend_condsets((), extensions, bitset_data, min_support, min_confidence, all_CARs)
+    return all_CARs
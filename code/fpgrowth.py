@@ -0,0 +1,199 @@
+"""
+FP-growth rule generator shared by CBA and CMAR:
+Input: preprocessed data, minimum support and minimum confidence
+Output: Class Association Rules, either as a CARs object (CBA, like rulegenerator.rule_generator_main)
+or as a CR tree (CMAR, like Part5_FP_Tree.rule_generator)
+
+The data_list is compressed into an FP-tree once. Every node stores the class distribution of the data cases
+going through it, so the class distribution of a pattern is the sum over its nodes, without scanning the data again.
+A pattern is frequent when it is frequent with at least one class label.
+"""
+
+import ruleitem
+import rulebudget
+import rulegenerator
+import Part5_FP_Tree
+import streaming
+import columnar
+
+
+class FPNode:
+    """
+    Node of the FP-tree with the class distribution of the data cases going through it.
+    """
+    def __init__(self, item, parent):
+        self.item = item  # item tuple: (column, value)
+        self.parent = parent  # parent node
+        self.child = dict()  # {item: child node}
+        self.label_count = dict()  # {class label: count}
+
+
+def count_items(cases, item_count):
+    """ Add the class distribution of every item of the weighted data cases to item_count {item: {class label: count}}.
+    cases: list of (items, {class label: count}), the items of a case may be in any order """
+    for items, label_count in cases:
+        for item in items:
+            count = item_count.setdefault(item, dict())
+            for label, num in label_count.items():
+                count[label] = count.get(label, 0) + num
+
+
+def new_tree(item_count, is_frequent):
+    """ Create an empty FP-tree for the frequent items of item_count.
+    Return the root, the header table {item: list of nodes} in ascending order of frequency,
+    so that the patterns are grown from the least frequent item, and the rank {item: index} of the frequent items. """
+    # keep the frequent items, ordered by descending frequency then canonical order
+    frequency = dict((item, sum(count.values())) for item, count in item_count.items() if is_frequent(count))
+    order = sorted(frequency, key=lambda item: (-frequency[item], item))
+    rank = dict((item, index) for index, item in enumerate(order))
+    header_table = dict((item, []) for item in reversed(order))
+    return FPNode(None, None), header_table, rank
+
+
+def insert_cases(root, header_table, rank, cases):
+    """ Insert the weighted data cases into the FP-tree, keeping only their frequent items. """
+    for items, label_count in cases:
+        ordered_items = sorted([item for item in items if item in rank], key=rank.get)
+        node = root
+        for item in ordered_items:
+            if item not in node.child:
+                node.child[item] = FPNode(item, node)
+                header_table[item].append(node.child[item])
+            node = node.child[item]
+            for label, num in label_count.items():
+                node.label_count[label] = node.label_count.get(label, 0) + num
+
+
+def create_tree(cases, is_frequent):
+    """ Create the FP-tree of weighted data cases.
+    cases: list of (items, {class label: count}), the items of a case may be in any order
+    is_frequent: function telling whether a class distribution is frequent
+    Return the header table {item: list of nodes}, in ascending order of frequency. """
+    item_count = dict()
+    count_items(cases, item_count)
+    root, header_table, rank = new_tree(item_count, is_frequent)
+    insert_cases(root, header_table, rank, cases)
+    return header_table
+
+
+def mine_patterns(header_table, prefix, is_frequent, emit):
+    """ Recursively grow the patterns ending with prefix.
+    emit(pattern, label_count) is called for every frequent pattern and returns False
+    when no extension of the pattern can be used, the branch is then skipped. """
+    for item, nodes in header_table.items():
+        # class distribution of the pattern, summed over the nodes of the item
+        label_count = dict()
+        for node in nodes:
+            for label, num in node.label_count.items():
+                label_count[label] = label_count.get(label, 0) + num
+        pattern = prefix + (item,)
+        if not emit(pattern, label_count):
+            continue
+        # conditional pattern base: the path above every node, weighted by the class distribution of the node
+        conditional_cases = []
+        for node in nodes:
+            path = []
+            parent = node.parent
+            while parent.item is not None:
+                path.append(parent.item)
+                parent = parent.parent
+            if path:
+                conditional_cases.append((path, node.label_count))
+        if conditional_cases:
+            conditional_table = create_tree(conditional_cases, is_frequent)
+            if conditional_table:
+                mine_patterns(conditional_table, pattern, is_frequent, emit)
+
+
+def fp_growth(data_list, min_support, emit):
+    """ Mine every pattern frequent with at least one class label: count / len(data_list) >= min_support. """
+    def is_frequent(label_count):
+        # len of a streaming.BatchStream is known after the first pass over its data cases
+        return max(label_count.values()) / len(data_list) >= min_support
+
+    if isinstance(data_list, streaming.BatchStream):
+        header_table = stream_tree(data_list, is_frequent)
+    else:
+        if isinstance(data_list, columnar.ColumnarData):
+            # the identical data cases are merged into one case weighted by their class distribution
+            cases = [(list(enumerate(values)), label_count) for values, label_count in data_list.distinct_cases()]
+        else:
+            cases = [(list(enumerate(data[:-1])), {data[-1]: 1}) for data in data_list]
+        header_table = create_tree(cases, is_frequent)
+    mine_patterns(header_table, (), is_frequent, emit)
+
+
+def batch_cases(batch_stream):
+    """ Yield the weighted data cases of every batch of a streaming.BatchStream,
+    the identical data cases of a columnar batch are merged into one case weighted by their class distribution. """
+    for batch in batch_stream.batches():
+        if isinstance(batch, columnar.ColumnarData):
+            yield [(list(enumerate(values)), label_count) for values, label_count in batch.distinct_cases()]
+        else:
+            yield [(list(enumerate(data[:-1])), {data[-1]: 1}) for data in batch]
+
+
+def stream_tree(batch_stream, is_frequent):
+    """ Create the FP-tree of a streaming.BatchStream in two passes over the file, like create_tree:
+    the first pass counts the class distribution of every item, the second inserts the data cases of every batch
+    straight into the tree, so only one batch and the tree are kept in memory.
+    Return the header table {item: list of nodes}, in ascending order of frequency. """
+    item_count = dict()
+    for cases in batch_cases(batch_stream):
+        count_items(cases, item_count)
+    root, header_table, rank = new_tree(item_count, is_frequent)
+    for cases in batch_cases(batch_stream):
+        insert_cases(root, header_table, rank, cases)
+    return header_table
+
+
+# main function to generate the CARs of CBA
+def rule_generator_fpgrowth(data_list, min_support, min_confidence,
+                            max_rules=rulebudget.DEFAULT_MAX_RULES, max_memory=None):
+    """ max_rules, max_memory: the rule budget, only the best rules by precedence are kept (None for no limit).
+    The frequent ruleitems are those of rule_generator_main with no candidate limit (max_candidates None, the default),
+    and the ties of precedence are broken canonically, so the CARs are the same although the patterns
+    are enumerated in another order. """
+    budget = rulebudget.RuleBudget(max_rules, max_memory, None)
+    count_cache = rulegenerator.CountCache(data_list)
+    all_CARs = rulegenerator.CARs(budget, count_cache)
+
+    def emit(pattern, label_count):
+        # known once fp_growth has read the data cases, even from a streaming.BatchStream
+        data_size = len(data_list)
+        key = tuple(sorted(pattern))
+        max_support = max(label_count.values()) / data_size
+        # no rule extending this pattern can enter the full rule budget
+        if budget.prunes_branch(max_support, len(key)):
+            return False
+        condsupCount = sum(label_count.values())
+        for label, rulesupCount in label_count.items():
+            count_cache.add(key, label, condsupCount, rulesupCount)
+            if rulesupCount / data_size >= min_support:
+                rule_item = ruleitem.RuleItem(dict(key), label, data_list, (condsupCount, rulesupCount))
+                all_CARs.add_CARs_rule(rule_item, min_support, min_confidence)
+        return True
+
+    fp_growth(data_list, min_support, emit)
+    return all_CARs
+
+
+# main function to generate the CR tree of CMAR
+def CR_tree_generator(data_list, min_support, min_confidence, budget=None):
+    """ min_support: the fraction of the data_list, like rule_generator_main.
+    The rules are selected like Part5_FP_Tree.rule_generator: the majority class label of every pattern,
+    then the minimum support and confidence, the X^2 test and the rule budget.
+    Return the CR tree root. """
+    if budget is None:
+        budget = rulebudget.RuleBudget()
+    min_sup = min_support * len(data_list)
+
+    def emit(pattern, label_count):
+        # no pattern extending this one can enter the full rule budget
+        if budget.prunes_branch(max(label_count.values()), len(pattern)):
+            return False
+        Part5_FP_Tree.add_rules({tuple(sorted(pattern)): label_count}, min_sup, min_confidence, data_list, budget)
+        return True
+
+    fp_growth(data_list, min_support, emit)
+    return Part5_FP_Tree.build_CR_tree(budget)
@@ -0,0 +1,260 @@
+"""
+Persisted model format of the trained CBA and CMAR classifiers.
+Input: a trained classifier (CBA_CB_M2.Classifier_M2, or the CR tree root of CMAR with its class statistics)
+and the encoding filled by preprocessing.preprocessing_main
+Output: a model file, loaded back to predict new data without reading, discretizing or mining the training data
+
+Layout of a model file:
+    magic b"CARMODEL", then the format version and the header size as little-endian unsigned 32-bit integers
+    header: JSON with the encoding, the class labels, the items, the default class and the table of arrays
+    arrays: 8-byte aligned, in the byte order recorded in the header
+        rule_offsets: int32, the items of rule i are rule_items[rule_offsets[i]:rule_offsets[i + 1]]
+        rule_items: int32, indices into the items of the header
+        rule_labels: int32, indices into the class labels of the header
+        rule_support, rule_confidence, rule_x2: float64, CMAR only
+The rules are in the order of the rule list (CBA) or of Part5_CR_Tree.CRT_rules (CMAR).
+The file is memory-mapped and the arrays are read in place, without copying them: NumPy arrays over the mapping
+(numpy.frombuffer) when NumPy is installed (see columnar.AVAILABLE), memoryviews otherwise. The mapping stays open
+as long as the model, only the arrays of a file written on a machine of the other byte order are copied.
+"""
+
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+import columnar
+import predictor
+import preprocessing
+import CBA_CB_M2
+import Part5_CR_Tree
+import Part5_Classifier
+
+MAGIC = b"CARMODEL"
+FORMAT_VERSION = 1
+# magic, format version, header size
+PREAMBLE = struct.Struct("<8sII")
+ALIGNMENT = 8
+
+
+class ModelRule:
+    """
+    A rule loaded from a model file, with the fields the classifiers use.
+    """
+    def __init__(self, condset, label):
+        self.condset = condset
+        self.label = label
+
+
+class Model:
+    """
+    A model loaded by load_model.
+    kind: "CBA" or "CMAR"
+    encoding: the encoding of preprocessing_main, to preprocess new data with preprocessing.apply_encoding
+    classifier: the Classifier_M2 (CBA)
+    CR_tree_root, class_sup_dic, t: the CR tree, the number of training data cases of each class label
+    and of the training dataset (CMAR)
+    arrays: the dictionary {name: array} of the arrays of the file, read in place from buffer
+    buffer: the memory map of the file
+    """
+    def __init__(self, kind, encoding):
+        self.kind = kind
+        self.encoding = encoding
+        self.classifier = None
+        self.CR_tree_root = None
+        self.class_sup_dic = None
+        self.t = None
+        self.arrays = dict()
+        self.buffer = None
+        self._predictor = None
+
+    def encode(self, data):
+        """ Preprocess new data the same way as the training data. """
+        return preprocessing.apply_encoding(data, self.encoding)
+
+    def predict(self, data, encoded=False):
+        """ Predict the class labels of new data.
+        encoded: True when the data has already been preprocessed """
+        if not encoded:
+            data = self.encode(data)
+        if self.kind == "CBA":
+            if self._predictor is None:
+                self._predictor = predictor.compile_classifier(self.classifier)
+            return self._predictor.predict(data)
+        return [Part5_Classifier.classify(row, self.CR_tree_root, self.class_sup_dic, self.t) for row in data]
+
+
+def encoding_to_json(encoding):
+    """ JSON form of the encoding: a list of [column, split points] and [column, [[class, integer], ...]]. """
+    columns = []
+    for column, column_encoding in sorted(encoding.items()):
+        if isinstance(column_encoding, list):
+            columns.append([column, "numerical", column_encoding])
+        else:
+            columns.append([column, "categorical", [[c, index] for c, index in column_encoding.items()]])
+    return columns
+
+
+def encoding_from_json(columns):
+    """ Inverse of encoding_to_json. """
+    encoding = dict()
+    for column, column_type, column_encoding in columns:
+        if column_type == "numerical":
+            encoding[column] = column_encoding
+        else:
+            encoding[column] = dict((c, index) for c, index in column_encoding)
+    return encoding
+
+
+def rules_to_arrays(rules, labels):
+    """ Pack the rules into arrays.
+    rules: list of (items, label), items being the list of (column, value) of the rule
+    labels: the list of class labels, extended with the labels of the rules
+    Return the list of items and the arrays rule_offsets, rule_items and rule_labels. """
+    items = []
+    item_index = dict()
+    label_index = dict((label, index) for index, label in enumerate(labels))
+    rule_offsets = array('i', [0])
+    rule_items = array('i')
+    rule_labels = array('i')
+    for rule_items_list, label in rules:
+        for item in rule_items_list:
+            if item not in item_index:
+                item_index[item] = len(items)
+                items.append(item)
+            rule_items.append(item_index[item])
+        rule_offsets.append(len(rule_items))
+        if label not in label_index:
+            label_index[label] = len(labels)
+            labels.append(label)
+        rule_labels.append(label_index[label])
+    return items, [("rule_offsets", rule_offsets), ("rule_items", rule_items), ("rule_labels", rule_labels)]
+
+
+def write_model(path, header, arrays):
+    """ Write the header and the arrays [(name, array)] into a model file. """
+    header = dict(header)
+    header["byteorder"] = sys.byteorder
+    # the offsets of the arrays, relative to the first (aligned) byte after the header
+    table = []
+    offset = 0
+    for name, values in arrays:
+        offset = align(offset)
+        table.append([name, values.typecode, offset, len(values)])
+        offset += values.itemsize * len(values)
+    header["arrays"] = table
+    header_bytes = json.dumps(header).encode("utf-8")
+    with open(path, "wb") as model_file:
+        model_file.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        model_file.write(header_bytes)
+        position = PREAMBLE.size + len(header_bytes)
+        start = align(position)
+        model_file.write(bytes(start - position))
+        for (name, values), (_, _, offset, _) in zip(arrays, table):
+            model_file.write(bytes(start + offset - model_file.tell()))
+            model_file.write(values.tobytes())
+
+
+def align(offset):
+    """ Round the offset up to the alignment of the arrays. """
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save_CBA_model(path, classifier, encoding):
+    """ Save a trained Classifier_M2 and the encoding of its training data. """
+    labels = []
+    rules = [(sorted(rule.condset.items()), rule.label) for rule in classifier.rule_list]
+    items, arrays = rules_to_arrays(rules, labels)
+    if classifier.default_label not in labels:
+        labels.append(classifier.default_label)
+    header = {
+        "kind": "CBA",
+        "encoding": encoding_to_json(encoding),
+        "labels": labels,
+        "items": items,
+        "default_label": labels.index(classifier.default_label),
+    }
+    write_model(path, header, arrays)
+
+
+def save_CMAR_model(path, CR_tree_root, class_sup_dic, t, encoding):
+    """ Save a trained CR tree, the class statistics of Part5_Classifier.class_sup_preprocess
+    and the encoding of its training data. """
+    labels = list(class_sup_dic)
+    # rule: [attri_1, attri_2, ... attri_n, class label, support, confidence, X^2]
+    CR_rules = Part5_CR_Tree.CRT_rules(CR_tree_root)
+    items, arrays = rules_to_arrays([(rule[:-4], rule[-4]) for rule in CR_rules], labels)
+    arrays.append(("rule_support", array('d', [rule[-3] for rule in CR_rules])))
+    arrays.append(("rule_confidence", array('d', [rule[-2] for rule in CR_rules])))
+    arrays.append(("rule_x2", array('d', [rule[-1] for rule in CR_rules])))
+    header = {
+        "kind": "CMAR",
+        "encoding": encoding_to_json(encoding),
+        "labels": labels,
+        "items": items,
+        "class_sup": [class_sup_dic.get(label, 0) for label in labels],
+        "t": t,
+    }
+    write_model(path, header, arrays)
+
+
+def load_model(path):
+    """ Load a model file saved by save_CBA_model or save_CMAR_model. """
+    with open(path, "rb") as model_file:
+        buffer = mmap.mmap(model_file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, header_size = PREAMBLE.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("%s is not a model file" % path)
+    if version != FORMAT_VERSION:
+        raise ValueError("unsupported model format version %d in %s" % (version, path))
+    header = json.loads(buffer[PREAMBLE.size:PREAMBLE.size + header_size].decode("utf-8"))
+    start = align(PREAMBLE.size + header_size)
+    model = Model(header["kind"], encoding_from_json(header["encoding"]))
+    model.buffer = buffer
+    view = memoryview(buffer)
+    for name, typecode, offset, length in header["arrays"]:
+        if columnar.AVAILABLE:
+            values = columnar.numpy.frombuffer(buffer, columnar.numpy.dtype(typecode), length, start + offset)
+        else:
+            values = view[start + offset:start + offset + array(typecode).itemsize * length].cast(typecode)
+        # copy only when the file was written on a machine of the other byte order
+        if header["byteorder"] != sys.byteorder:
+            values = array(typecode, values)
+            values.byteswap()
+        model.arrays[name] = values
+
+    labels = header["labels"]
+    items = [tuple(item) for item in header["items"]]
+    rule_offsets = model.arrays["rule_offsets"]
+    rule_items = model.arrays["rule_items"]
+    rule_labels = model.arrays["rule_labels"]
+    rules = []
+    for index in range(len(rule_labels)):
+        rule_items_list = [items[item] for item in rule_items[rule_offsets[index]:rule_offsets[index + 1]]]
+        rules.append((rule_items_list, labels[rule_labels[index]]))
+
+    if model.kind == "CBA":
+        model.classifier = CBA_CB_M2.Classifier_M2()
+        model.classifier.rule_list = [ModelRule(dict(rule_items_list), label) for rule_items_list, label in rules]
+        model.classifier.default_label = labels[header["default_label"]]
+    else:
+        model.class_sup_dic = dict((label, count) for label, count in zip(labels, header["class_sup"]) if count)
+        model.t = header["t"]
+        # rebuild the CR tree, the classifier does not use the header table of Part5_CR_Tree.CRT_add_rule.
+        # CRT_rules visits the children of a node from the last one, so the rules are added from the last one
+        # to create the children in their original order: the DFS of classify then meets the rules in the same
+        # order and sums the same weighted X^2
+        model.CR_tree_root = Part5_CR_Tree.CRTNode("CR root", None)
+        for index in reversed(range(len(rules))):
+            rule_items_list, label = rules[index]
+            node = model.CR_tree_root
+            for attri in rule_items_list:
+                if attri not in node.child:
+                    node.child[attri] = Part5_CR_Tree.CRTNode(attri, node)
+                node = node.child[attri]
+            node.label = label
+            node.support = model.arrays["rule_support"][index]
+            node.confidence = model.arrays["rule_confidence"][index]
+            node.x2 = model.arrays["rule_x2"][index]
+    return model
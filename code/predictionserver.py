@@ -0,0 +1,346 @@
+"""
+Local prediction server of the persisted CBA and CMAR models.
+Input: a model file saved by modelfile.py, then raw data rows sent over HTTP (TCP or UNIX socket)
+Output: the predicted class labels, and the latency percentiles and throughput of the server
+
+Requests:
+    POST /predict  body {"rows": [[attribute value, ...], ...]}, the rows as read by readfile.read_files
+                   without the class label, answered with {"labels": [...]}
+    GET /stats     latency percentiles (in ms) and throughput of the server
+
+The rows of the concurrent requests are gathered into one batch, until max_batch rows are waiting
+or the first waiting request has waited max_delay seconds. The rows of each request are encoded with the
+preprocessing mappings of the model, then the batch is scored at once (with batchscoring.py when NumPy
+is installed). When the batch cannot be scored at once, its requests are scored one at a time, so that
+only the request with the bad rows is answered with an error.
+
+Usage: python predictionserver.py model_file [--host HOST] [--port PORT] [--unix PATH]
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import time
+
+import modelfile
+
+try:
+    import numpy
+    import batchscoring
+except ImportError:
+    numpy = None
+    batchscoring = None
+
+# number of request latencies kept for the percentiles
+LATENCY_WINDOW = 10000
+# default maximum size in bytes of the body of a request, a larger request is answered with 413
+MAX_BODY_SIZE = 16 << 20
+
+
+class RequestTooLarge(ValueError):
+    """ The body of a request is larger than the maximum body size of the server. """
+
+
+def check_rows(rows):
+    """ Return why the rows of a request cannot be scored, None when they are a non-empty list of rows
+    with the same number of values. """
+    if not isinstance(rows, list) or not rows:
+        return "rows must be a non-empty list of rows"
+    if not all(isinstance(row, list) for row in rows):
+        return "every row must be a list of attribute values"
+    if any(len(row) != len(rows[0]) for row in rows):
+        return "every row must have the same number of attribute values"
+    return None
+
+
+def score(model, encoded):
+    """ Predict the class labels of rows encoded with the mappings of the model. """
+    if batchscoring is None or not encoded:
+        return model.predict(encoded, encoded=True)
+    cases = numpy.array(encoded, dtype=object)
+    if model.kind == "CBA":
+        labels = batchscoring.predict_rule_list(model.classifier, cases)
+    else:
+        labels = batchscoring.predict_CR_tree(model.CR_tree_root, model.class_sup_dic, model.t, cases)
+    return labels.tolist()
+
+
+def score_requests(model, requests_rows):
+    """ Score the raw rows of several requests as one batch.
+    Return for each request the list of its class labels, or the exception raised by its rows. """
+    results = [None] * len(requests_rows)
+    encoded = []
+    for index, rows in enumerate(requests_rows):
+        try:
+            encoded.append((index, model.encode(rows)))
+        except Exception as error:
+            results[index] = error
+    try:
+        labels = score(model, [row for index, rows in encoded for row in rows])
+    except Exception:
+        # score the requests one at a time, so that only the bad ones fail
+        for index, rows in encoded:
+            try:
+                results[index] = score(model, rows)
+            except Exception as error:
+                results[index] = error
+    else:
+        # split the labels back to the requests
+        position = 0
+        for index, rows in encoded:
+            results[index] = labels[position:position + len(rows)]
+            position += len(rows)
+    return results
+
+
+def percentile(sorted_values, fraction):
+    """ Nearest-rank percentile of a sorted list. """
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class ServerStats:
+    """
+    Latency of the last requests, and number of requests, rows and batches since the server started.
+    """
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.num_requests = 0
+        self.num_rows = 0
+        self.num_batches = 0
+
+    def add_request(self, latency, num_rows):
+        self.latencies.append(latency)
+        self.num_requests += 1
+        self.num_rows += num_rows
+
+    def report(self):
+        """ Return the statistics as a dictionary. """
+        elapsed = time.perf_counter() - self.start_time
+        latencies = sorted(self.latencies)
+        report = {
+            "requests": self.num_requests,
+            "rows": self.num_rows,
+            "batches": self.num_batches,
+            "mean_batch_rows": self.num_rows / self.num_batches if self.num_batches else 0,
+            "requests_per_second": self.num_requests / elapsed,
+            "rows_per_second": self.num_rows / elapsed,
+        }
+        for name, fraction in (("p50_ms", 0.5), ("p90_ms", 0.9), ("p99_ms", 0.99), ("max_ms", 1.0)):
+            value = percentile(latencies, fraction)
+            report[name] = value * 1000 if value is not None else None
+        return report
+
+
+class MicroBatcher:
+    """
+    Gather the rows of concurrent requests into batches scored in a worker thread,
+    so that the event loop keeps accepting requests while a batch is scored.
+    """
+    def __init__(self, model, stats, max_batch=1024, max_delay=0.002):
+        self.model = model
+        self.stats = stats
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue = asyncio.Queue()
+
+    async def predict(self, rows):
+        """ Wait for the class labels of the rows. """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((rows, future))
+        return await future
+
+    async def run(self):
+        """ Score the waiting requests batch after batch, until cancelled. """
+        while True:
+            requests = []
+            try:
+                await self.run_batch(requests)
+            except Exception as error:
+                # answer the requests of the batch, the batcher keeps serving the next ones
+                for rows, future in requests:
+                    if not future.done():
+                        future.set_exception(error)
+
+    async def run_batch(self, requests):
+        """ Gather the waiting requests into requests, then score them and answer them. """
+        loop = asyncio.get_running_loop()
+        requests.append(await self.queue.get())
+        num_rows = len(requests[0][0])
+        deadline = loop.time() + self.max_delay
+        # wait for more requests until the batch is full or the first request waited max_delay
+        while num_rows < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                request = await asyncio.wait_for(self.queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            requests.append(request)
+            num_rows += len(request[0])
+        results = await loop.run_in_executor(None, score_requests, self.model, [rows for rows, future in requests])
+        self.stats.num_batches += 1
+        for (rows, future), result in zip(requests, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+async def read_request(reader, max_body_size=MAX_BODY_SIZE):
+    """ Read one HTTP request, return (method, path, headers, body), None when the connection is closed.
+    Raise ValueError when the request is malformed, RequestTooLarge when its Content-Length is above max_body_size,
+    before reading the body. """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+    except asyncio.LimitOverrunError:
+        raise ValueError("request header too long")
+    lines = head.decode("latin-1").split("\r\n")
+    request_line = lines[0].split(" ")
+    if len(request_line) < 2:
+        raise ValueError("malformed request line %r" % lines[0])
+    method, path = request_line[:2]
+    headers = dict()
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    body = b""
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise ValueError("malformed Content-Length %r" % headers["content-length"])
+    if length < 0:
+        raise ValueError("negative Content-Length %d" % length)
+    if length > max_body_size:
+        raise RequestTooLarge("Content-Length %d above the maximum of %d bytes" % (length, max_body_size))
+    if length:
+        try:
+            body = await reader.readexactly(length)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            # the client closed the connection before sending the whole body
+            return None
+    return method, path, headers, body
+
+
+def write_response(writer, status, content):
+    """ Write an HTTP response with a JSON body. """
+    body = json.dumps(content).encode("utf-8")
+    writer.write(("HTTP/1.1 %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n"
+                  % (status, len(body))).encode("latin-1") + body)
+
+
+class PredictionServer:
+    """
+    HTTP front end of the MicroBatcher.
+    """
+    def __init__(self, model, max_batch=1024, max_delay=0.002, max_body_size=MAX_BODY_SIZE):
+        self.stats = ServerStats()
+        self.max_body_size = max_body_size
+        self.batcher = MicroBatcher(model, self.stats, max_batch, max_delay)
+
+    async def handle_connection(self, reader, writer):
+        """ Answer the requests of a (keep-alive) connection. """
+        try:
+            while True:
+                try:
+                    request = await read_request(reader, self.max_body_size)
+                except RequestTooLarge as error:
+                    # the body is not read, so the connection cannot be used for another request
+                    write_response(writer, "413 Payload Too Large", {"error": str(error)})
+                    await writer.drain()
+                    break
+                except ValueError as error:
+                    # the end of the request is unknown, so is the start of the next one
+                    write_response(writer, "400 Bad Request", {"error": str(error)})
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                start_time = time.perf_counter()
+                if method == "POST" and path == "/predict":
+                    try:
+                        rows = json.loads(body)["rows"]
+                        problem = check_rows(rows)
+                    except (ValueError, KeyError, TypeError):
+                        problem = 'expected {"rows": [...]}'
+                    if problem is not None:
+                        write_response(writer, "400 Bad Request", {"error": problem})
+                    else:
+                        try:
+                            labels = await self.batcher.predict(rows)
+                        except Exception as error:
+                            write_response(writer, "500 Internal Server Error", {"error": str(error)})
+                        else:
+                            write_response(writer, "200 OK", {"labels": labels})
+                            self.stats.add_request(time.perf_counter() - start_time, len(rows))
+                elif method == "GET" and path == "/stats":
+                    write_response(writer, "200 OK", self.stats.report())
+                else:
+                    write_response(writer, "404 Not Found", {"error": "unknown request %s %s" % (method, path)})
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def report_stats(self, interval):
+        """ Print the statistics every interval seconds. """
+        while True:
+            await asyncio.sleep(interval)
+            print(json.dumps(self.stats.report()), flush=True)
+
+    async def serve(self, host="127.0.0.1", port=8000, unix_path=None, report_interval=None):
+        """ Serve until cancelled, on a UNIX socket when unix_path is given, else on host:port. """
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, unix_path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        tasks = [asyncio.ensure_future(self.batcher.run())]
+        if report_interval:
+            tasks.append(asyncio.ensure_future(self.report_stats(report_interval)))
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a persisted CBA or CMAR model.")
+    parser.add_argument("model_file", help="model file saved by modelfile.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--unix", default=None, help="path of a UNIX socket to listen on instead of host:port")
+    parser.add_argument("--max-batch", type=int, default=1024, help="maximum number of rows scored in a batch")
+    parser.add_argument("--max-delay", type=float, default=0.002,
+                        help="maximum time in seconds a request waits for other requests to join its batch")
+    parser.add_argument("--max-body-size", type=int, default=MAX_BODY_SIZE,
+                        help="maximum size in bytes of a request body, larger requests are answered with 413")
+    parser.add_argument("--report-interval", type=float, default=None,
+                        help="print the latency percentiles and throughput every this many seconds")
+    args = parser.parse_args()
+    model = modelfile.load_model(args.model_file)
+    server = PredictionServer(model, args.max_batch, args.max_delay, args.max_body_size)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix, args.report_interval))
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(server.stats.report()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Compiled predictor of the rule-list classifiers (CBA-CB M2).
+Input: a trained classifier, i.e. a rule_list in descending order of precedence and a default label
+Output: the predicted class labels of a batch of data cases
+
+A data case is classified by the first rule in the rule_list covering it, or by the default label
+when no rule covers it. Instead of checking every rule in turn, the predictor keeps an inverted index
+from each item (column, value) to the bitmap of the ranks of the rules containing it. The rules covering
+a data case are found with one bitmap intersection per column, and the first one is the lowest rank set.
+"""
+
+
+class RuleListPredictor:
+    """
+    rule_list: the rules in descending order of precedence, the rank of a rule is its position
+    default_label: the label of the data cases covered by no rule
+    """
+    def __init__(self, rule_list, default_label):
+        """ labels: the class label of each rule, by rank
+        item_index: a dictionary {(column, value): bitmap of the ranks of the rules containing the item}
+        column_free: a dictionary {column: bitmap of the ranks of the rules without a condition on the column}
+        all_rules: the bitmap of every rank """
+        self.labels = [rule.label for rule in rule_list]
+        self.default_label = default_label
+        self.all_rules = (1 << len(rule_list)) - 1
+        self.item_index = dict()
+        column_rules = dict()
+        for rank, rule in enumerate(rule_list):
+            for column in rule.condset:
+                item = (column, rule.condset[column])
+                self.item_index[item] = self.item_index.get(item, 0) | (1 << rank)
+                column_rules[column] = column_rules.get(column, 0) | (1 << rank)
+        self.column_free = dict((column, self.all_rules & ~rules) for column, rules in column_rules.items())
+        self.columns = sorted(column_rules)
+
+    def predict_one(self, data):
+        """ Predict the class label of a single data case. """
+        # the rules covering the data case: on every column they have a condition on, the value is the same
+        covered = self.all_rules
+        for column in self.columns:
+            covered &= self.item_index.get((column, data[column]), 0) | self.column_free[column]
+            if not covered:
+                return self.default_label
+        # the lowest rank set is the first rule covering the data case
+        return self.labels[(covered & -covered).bit_length() - 1]
+
+    def predict(self, rows):
+        """ Predict the class labels of a batch of data cases.
+        rows: data cases in the format of the preprocessed data_list, the class label column may be omitted """
+        return [self.predict_one(data) for data in rows]
+
+
+def compile_classifier(classifier):
+    """ Compile a trained classifier (e.g. CBA_CB_M2.Classifier_M2) into a RuleListPredictor. """
+    return RuleListPredictor(classifier.rule_list, classifier.default_label)
@@ -1,5 +1,8 @@
+import bisect
+import concurrent.futures
 import discretization
 import readfile
+import warnings
 
 # Retrive the two columns of data for discretization
 # Combine the two columns
@@ -48,8 +51,19 @@ def replace_with_integer(data_list, column):
         data_list: the data list returned from reading the data file
         column: the index of the categorical data column """
     num_rows = len(data_list)
-    # get distinct categorical classes in the data column
-    categorical_classes = set([x[column] for x in data_list]) 
+    classes_index = find_classes_index([x[column] for x in data_list])
+    for row in range(num_rows):
+        # assign the classes index to its respective categorical class
+        data_list[row][column] = classes_index[data_list[row][column]] 
+    return data_list, classes_index
+
+
+# Assign a positive integer to each categorical class
+def find_classes_index(data_column):
+    """ Return the dictionary {categorical class: positive integer} of a categorical data column. """
+    # get distinct categorical classes in the data column, in the order they first appear,
+    # so that the integers do not depend on the hash seed
+    categorical_classes = list(dict.fromkeys(data_column))
     # a dictionary of each dinstinct categorical class
     # the value of the dictionary will be used as the positve integer assiged to the categorical data
     classes_index = dict([(c, 0) for c in categorical_classes]) 
@@ -59,21 +73,160 @@ def replace_with_integer(data_list, column):
         # the index start at 1
         classes_index[c] = index
         index += 1
-    for row in range(num_rows):
-        # assign the classes index to its respective categorical class
-        data_list[row][column] = classes_index[data_list[row][column]] 
-    return data_list, classes_index
+    return classes_index
+
+
+# Find the split points of a numerical column
+def find_split_points(data_column, label_column, executor=None, boundary_only=False):
+    """ Discretize a numerical data column by discretization.py.
+        When no split point is found, the range of the values is split into 3 equal intervals.
+        executor: a process pool splitting the large sub-blocks of the column, see discretization.complete_split
+        boundary_only: only evaluate the boundary points, see discretization.binary_split """
+    discretization_data = find_discretization_data(data_column, label_column)
+    datablock = discretization.DataBlock(discretization_data)
+    split_points = discretization.complete_split(datablock, executor, boundary_only=boundary_only)
+    # if there are no split points return
+    if len(split_points) == 0:
+        max_value = max(data_column)
+        min_value = min(data_column)
+        interval = (max_value - min_value) / 3
+        split_points.append(min_value + interval)
+        split_points.append(min_value + 2 * interval)
+    return split_points
+
+
+# Find the split points of every numerical column
+def find_all_split_points(data, attribute_types, workers=None, boundary_only=False):
+    """ Return the dictionary {column: split points} of the numerical columns.
+        workers: the number of processes discretizing the columns in parallel, None or 1 to discretize them
+        one after another. When there are fewer numerical columns than workers, the columns are discretized
+        one after another and the large sub-blocks of each column are spread across the processes instead.
+        The split points are the same in every case.
+        boundary_only: only evaluate the boundary points, see discretization.binary_split """
+    label_column = [x[-1] for x in data]
+    data_columns = dict((column, ([x[column] for x in data], label_column)) for column in range(len(data[0]) - 1)
+                        if attribute_types[column] == 'numerical')
+    return find_columns_split_points(data_columns, workers, boundary_only)
+
+
+# Find the split points of the given numerical columns
+def find_columns_split_points(data_columns, workers=None, boundary_only=False):
+    """ Return the dictionary {column: split points} of the dictionary {column: (values, class labels)}
+        data_columns, discretized like find_all_split_points. """
+    columns = list(data_columns)
+    if workers is None or workers <= 1 or not columns:
+        return dict((column, find_split_points(*data_columns[column], None, boundary_only)) for column in columns)
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        if len(columns) >= workers:
+            futures = dict((column, executor.submit(find_split_points, *data_columns[column], None, boundary_only))
+                           for column in columns)
+            return dict((column, future.result()) for column, future in futures.items())
+        return dict((column, find_split_points(*data_columns[column], executor, boundary_only))
+                    for column in columns)
+
+
+# Find the split points of every numerical column in one pass over the data file
+def find_split_points_streaming(data_path, names_path, max_bins=discretization.DEFAULT_MAX_BINS,
+                                max_memory=discretization.DEFAULT_MAX_MEMORY, boundary_only=False):
+    """ Return the dictionary {column: split points} of the numerical columns, like find_all_split_points,
+        without loading the data file: each numerical column is summarized by a discretization.StreamingHistogram
+        of at most max_bins bins, fewer when the histograms would take more than max_memory bytes together
+        (see discretization.max_bins_per_column). The split points are those of find_all_split_points
+        while no column has more than max_bins distinct values (see discretization.complete_split_histogram),
+        a warning names the columns where they are approximate and their tolerance.
+        boundary_only: only evaluate the boundary points, like find_all_split_points """
+    encoding = find_encoding_streaming(data_path, names_path, max_bins, max_memory=max_memory,
+                                       boundary_only=boundary_only)
+    return dict((column, column_encoding) for column, column_encoding in encoding.items()
+                if isinstance(column_encoding, list))
+
+
+# Find the encoding of preprocessing_main in one pass over the data file
+def find_encoding_streaming(data_path, names_path, max_bins=discretization.DEFAULT_MAX_BINS,
+                            batch_size=readfile.BATCH_SIZE, max_memory=discretization.DEFAULT_MAX_MEMORY,
+                            boundary_only=False):
+    """ Return the encoding filled by preprocessing_main, {column: split points} for the numerical columns
+        and {column: {categorical class: positive integer}} for the categorical columns,
+        reading the data file batch after batch by readfile.read_batches instead of loading it.
+        The split points are found like find_split_points_streaming, from the values that are not missing:
+        apply_encoding replaces the missing values '?' with 0.
+        boundary_only: only evaluate the boundary points, the split points are then approximate only when
+        histogram.max_shift(boundary_only) > 0 (see discretization.complete_split_histogram) """
+    attribute_names, attribute_types = readfile.read_names_file(names_path)
+    histograms = dict()
+    categorical_classes = dict()
+    num_numerical = attribute_types[:-1].count('numerical')
+    max_bins = discretization.max_bins_per_column(num_numerical, max_bins, max_memory)
+    for column in range(len(attribute_types) - 1):
+        if attribute_types[column] == 'numerical':
+            histograms[column] = discretization.StreamingHistogram(max_bins)
+        elif attribute_types[column] == 'categorical':
+            # the distinct classes in the order they first appear, a dictionary used as an ordered set
+            categorical_classes[column] = dict()
+    for batch in readfile.read_batches(data_path, names_path, batch_size):
+        for line in batch:
+            for column, histogram in histograms.items():
+                # skip the missing values
+                if line[column] != '?':
+                    histogram.add(line[column], line[-1])
+            for column, classes in categorical_classes.items():
+                classes[line[column]] = None
+    encoding = dict()
+    for column, histogram in histograms.items():
+        split_points = discretization.complete_split_histogram(histogram, boundary_only)
+        max_shift = histogram.max_shift(boundary_only)
+        if max_shift > 0:
+            warnings.warn("column %d needs more than max_bins=%d bins, its split points are approximate: "
+                          "the candidate cuts are within %d data cases of the exact ones"
+                          % (column, histogram.max_bins, max_shift))
+        # if there are no split points, split the range of the values into 3 equal intervals
+        bins = histogram.get_bins()
+        if len(split_points) == 0 and bins:
+            max_value = bins[-1][1]
+            min_value = bins[0][0]
+            interval = (max_value - min_value) / 3
+            split_points.append(min_value + interval)
+            split_points.append(min_value + 2 * interval)
+        encoding[column] = split_points
+    for column, classes in categorical_classes.items():
+        encoding[column] = find_classes_index(list(classes))
+    return encoding
+
+
+# The index of the interval a value belongs to
+def discretize_value(value, split_points):
+    """ Return the new value complete_discretization assigns to a value, found by binary search.
+        A missing value '?' is replaced with 0, which no interval and no rule contains.
+        split_points: the list of splitting boundary, in ascending order """
+    if value == '?':
+        return 0
+    split_point_size = len(split_points)
+    # if the data > the last boundary, the index of the last interval,
+    # which complete_discretization then compares with the boundaries like a data value
+    if value > split_points[split_point_size-1]:
+        value = split_point_size + 1
+    # the first boundary the value is smaller than or equal to
+    i = bisect.bisect_left(split_points, value)
+    if i < split_point_size:
+        return i + 1
+    return value
 
 
 # This is the main function in this file
-def preprocessing_main(data, attributes, attribute_types):
+def preprocessing_main(data, attributes, attribute_types, encoding=None, workers=None, boundary_only=False):
     """ The main function in this python file.
         data: the original list of data returned from readDataFile.read_files()
         attributes: the list of attribute in the data
-        attribute_types: the respective data type of the attribute """
+        attribute_types: the respective data type of the attribute
+        encoding: a dictionary, when given it is filled with {column: split points} for the numerical columns
+        and {column: {categorical class: positive integer}} for the categorical columns,
+        so that new data can be preprocessed the same way by apply_encoding (see also Preprocessor)
+        workers: the number of processes discretizing the numerical columns, see find_all_split_points
+        boundary_only: only evaluate the boundary points when discretizing, see discretization.binary_split """
     num_columns = len(data[0])
     num_rows = len(data)
     label_column = [x[-1] for x in data]
+    all_split_points = find_all_split_points(data, attribute_types, workers, boundary_only)
     discard_list = []
     # iterate through each attribute column in the data
     for column in range(num_columns - 1):
@@ -81,22 +234,17 @@ def preprocessing_main(data, attributes, attribute_types):
         # discretization
         # if the type of data column is numerical
         if attribute_types[column] == 'numerical':
-            discretization_data = find_discretization_data(data_column, label_column)
-            datablock = discretization.DataBlock(discretization_data)
-            split_points = discretization.complete_split(datablock)
-            # if there are no split points return
-            if len(split_points) == 0:
-                max_value = max(data_column)
-                min_value = min(data_column)
-                interval = (max_value - min_value) / 3
-                split_points.append(min_value + interval)
-                split_points.append(min_value + 2 * interval)
+            split_points = all_split_points[column]
             # print out the split points of the data
             print(attributes[column] + ", split points:", split_points)       
             data = complete_discretization(data, column, split_points)
+            if encoding is not None:
+                encoding[column] = split_points
         # if the type of data column is categorical
         elif attribute_types[column] == 'categorical':
             data, classes_index = replace_with_integer(data, column)
+            if encoding is not None:
+                encoding[column] = classes_index
             # print out the classes and their assigned positive integer value
             print("Categorical atribute with new values:", attributes[column] + ":", classes_index) 
     print("The number of distict class label in the dataset is:", len(set(label_column)))  
@@ -104,6 +252,107 @@ def preprocessing_main(data, attributes, attribute_types):
     return data
 
 
+# Preprocess the columns returned from readfile.read_columns
+def preprocessing_columns(columns, missing, attributes, attribute_types, encoding=None, workers=None,
+                          boundary_only=False):
+    """ Return the data_list preprocessing_main returns for the data file read by readfile.read_columns,
+        encoding each column at once instead of each row.
+        columns, missing: the columns and the missing values returned from readfile.read_columns.
+        The split points are found from the values that are not missing, and the missing values are replaced
+        with 0 like apply_encoding.
+        encoding, workers, boundary_only: see preprocessing_main """
+    num_columns = len(columns)
+    label_column = columns[-1]
+    data_columns = dict()
+    for column in range(num_columns - 1):
+        if attribute_types[column] != 'numerical':
+            continue
+        if column in missing:
+            # leave the missing values out of the discretization
+            missing_rows = set(missing[column])
+            rows = [row for row in range(len(label_column)) if row not in missing_rows]
+            data_columns[column] = ([columns[column][row] for row in rows], [label_column[row] for row in rows])
+        else:
+            data_columns[column] = (columns[column], label_column)
+    all_split_points = find_columns_split_points(data_columns, workers, boundary_only)
+    new_columns = []
+    for column in range(num_columns - 1):
+        if attribute_types[column] == 'numerical':
+            split_points = all_split_points[column]
+            print(attributes[column] + ", split points:", split_points)
+            # the values up to the last boundary by binary search, the others like complete_discretization
+            last = split_points[-1]
+            new_column = [bisect.bisect_left(split_points, value) + 1 if value <= last
+                          else discretize_value(value, split_points) for value in columns[column]]
+            for row in missing.get(column, ()):
+                new_column[row] = 0
+            if encoding is not None:
+                encoding[column] = split_points
+        elif attribute_types[column] == 'categorical':
+            classes_index = find_classes_index(columns[column])
+            new_column = [classes_index[value] for value in columns[column]]
+            if encoding is not None:
+                encoding[column] = classes_index
+            print("Categorical atribute with new values:", attributes[column] + ":", classes_index)
+        else:
+            new_column = columns[column]
+        new_columns.append(new_column)
+    new_columns.append(label_column)
+    print("The number of distict class label in the dataset is:", len(set(label_column)))
+    print("Total number of attributes in the dataset: ", num_columns-1)
+    return [list(row) for row in zip(*new_columns)]
+
+
+# Preprocess new data with the encoding obtained by preprocessing_main
+def apply_encoding(data, encoding):
+    """ Replace the values of new data the same way preprocessing_main replaced the values of the training data.
+        data: the list of data returned from reading the data file, it is not modified
+        encoding: the dictionary filled by preprocessing_main
+        The categorical classes not seen in the training data and the missing values '?' of the numerical columns
+        are replaced with 0, which no rule contains. """
+    data = [list(row) for row in data]
+    for column, column_encoding in encoding.items():
+        # numerical column: the list of split points
+        if isinstance(column_encoding, list):
+            for row in data:
+                row[column] = discretize_value(row[column], column_encoding)
+        # categorical column: the dictionary of classes index
+        else:
+            for row in data:
+                row[column] = column_encoding.get(row[column], 0)
+    return data
+
+
+class Preprocessor:
+    """ Preprocessing split into fit, which finds the split points and the categorical classes index
+        of the training data, and transform, which replaces the values of any data with them,
+        so that the test data or new data is preprocessed without discretizing it again.
+        encoding: {column: split points} for the numerical columns
+        and {column: {categorical class: positive integer}} for the categorical columns, like preprocessing_main """
+    def __init__(self):
+        self.encoding = dict()
+
+    def fit(self, data, attribute_types, workers=None, boundary_only=False):
+        """ Find the encoding of the training data, the data is not modified.
+            data: the list of data returned from readDataFile.read_files(), with the class label in the last column
+            attribute_types: the respective data type of the attribute
+            workers: the number of processes discretizing the numerical columns, see find_all_split_points
+            boundary_only: only evaluate the boundary points, see find_all_split_points """
+        self.encoding = find_all_split_points(data, attribute_types, workers, boundary_only)
+        for column in range(len(data[0]) - 1):
+            if attribute_types[column] == 'categorical':
+                self.encoding[column] = find_classes_index([x[column] for x in data])
+        return self
+
+    def transform(self, data):
+        """ Return the preprocessed copy of the data, the class label column may be omitted. """
+        return apply_encoding(data, self.encoding)
+
+    def fit_transform(self, data, attribute_types, workers=None, boundary_only=False):
+        """ Fit the training data and return it preprocessed. """
+        return self.fit(data, attribute_types, workers, boundary_only).transform(data)
+
+
 # Testing
 if __name__ == '__main__':    
     test_data_path = 'dataset/iris.data'
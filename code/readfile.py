@@ -1,5 +1,15 @@
 import csv
-import preprocessing
+import gc
+import io
+from array import array
+
+# the placeholder of the missing values '?' in the numerical columns read by read_columns,
+# the missing values are told apart by their positions, a value 'nan' of the data file is NaN as well
+MISSING_VALUE = float('nan')
+# number of characters of the data file parsed at once by read_columns and read_batches
+CHUNK_SIZE = 1 << 20
+# number of data cases in a batch of read_batches
+BATCH_SIZE = 100000
 
 def convert_to_numerical(data_list, attribute_types):
 	""" When the attribute type is numerical
@@ -18,37 +28,141 @@ def convert_to_numerical(data_list, attribute_types):
 	return data_list
 
 
+# Read the file ending with *.names
+# return the list of data attributes and their value type
+def read_names_file(names_path):
+    """ Read scheme file *.names and write down attribute names and value types.
+        path: directory of *.names file. """
+    with open(names_path, 'r') as csv_file:
+        lines = csv.reader(csv_file, delimiter=',')
+        # Read the first line to get attributes name
+        attribute_names = next(lines) 
+        # Read the second line to get the value type for each attributes 
+        attribute_types = next(lines)  
+        return attribute_names, attribute_types
+
+
 # Main function: read the whole dataset and convert into a list.
 def read_files(data_path, names_path):
     """ filepath: directory of *.data file and *.name file. """
     # Read the file with *.data and get the data in every line
     # append the line in the data_list"""
-    data_list = []
     with open(data_path, 'r') as data_file:
         lines = csv.reader(data_file, delimiter=',')
-        for line in lines:
-            data_list.append(line)
-        while [] in data_list:
-            data_list.remove([])
-    
-    # Read the file ending with *.names
-    # return the list of data attributes and their value type
-    def read_names_file(names_path):
-        """ Read scheme file *.names and write down attribute names and value types.
-            path: directory of *.names file. """
-        with open(names_path, 'r') as csv_file:
-            lines = csv.reader(csv_file, delimiter=',')
-            # Read the first line to get attributes name
-            attribute_names = next(lines) 
-            # Read the second line to get the value type for each attributes 
-            attribute_types = next(lines)  
-            return attribute_names, attribute_types
+        # skip the blank lines
+        data_list = [line for line in lines if line]
     
     attribute_names, attribute_types = read_names_file(names_path)
     data_list = convert_to_numerical(data_list, attribute_types)
     return data_list, attribute_names, attribute_types
     
 
+def split_rows(text):
+    """ Split whole lines of the data file into rows of values, skipping the blank lines. """
+    if '"' in text:
+        # quoted values may contain commas, leave them to the csv module
+        return [row for row in csv.reader(io.StringIO(text), delimiter=',') if row]
+    return [line.split(',') for line in text.splitlines() if line]
+
+
+def parse_numerical(values):
+    """ Convert the values of a numerical column to an array of floats, '?' to MISSING_VALUE.
+        Return the array and the list of the positions of the missing values. """
+    try:
+        return array('d', map(float, values)), []
+    except ValueError:
+        missing = [position for position, value in enumerate(values) if value == '?']
+        return array('d', [MISSING_VALUE if value == '?' else float(value) for value in values]), missing
+
+
+def read_chunks(data_path, chunk_size=CHUNK_SIZE):
+    """ Read the *.data file chunk_size characters at a time, each chunk cut at its last line break,
+        and yield the rows of values of each chunk, the blank lines skipped. """
+    num_columns = None
+    with open(data_path, 'r') as data_file:
+        rest = ''
+        while True:
+            chunk = data_file.read(chunk_size)
+            text = rest + chunk
+            if chunk:
+                # the last line may continue in the next chunk
+                end = text.rfind('\n') + 1
+                text, rest = text[:end], text[end:]
+            rows = split_rows(text)
+            if rows:
+                if num_columns is None:
+                    num_columns = len(rows[0])
+                if set(map(len, rows)) != {num_columns}:
+                    raise ValueError("%s: every line must have %d values" % (data_path, num_columns))
+                yield rows
+            if not chunk:
+                break
+
+
+# Bulk loader: read the whole dataset column by column
+def read_columns(data_path, names_path, chunk_size=CHUNK_SIZE):
+    """ Read the *.data file by read_chunks and append the values of each chunk to the columns at once.
+        The numerical attribute columns (by the types of the *.names file) are parsed straight into array('d'),
+        with MISSING_VALUE for the missing values '?', the other columns (the class label column included)
+        are lists of strings.
+        Return the list of columns, the dictionary {column: array of the row numbers of the missing values}
+        of the numerical columns with missing values, the attribute names and the attribute types. """
+    attribute_names, attribute_types = read_names_file(names_path)
+    columns = []
+    missing = dict()
+    num_rows = 0
+    # the rows of a chunk are discarded right after, the garbage collector would only scan them again and again
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for rows in read_chunks(data_path, chunk_size):
+            if not columns:
+                num_columns = len(rows[0])
+                columns = [array('d') if column < num_columns - 1 and attribute_types[column] == 'numerical'
+                           else [] for column in range(num_columns)]
+            for index, (column, values) in enumerate(zip(columns, zip(*rows))):
+                if isinstance(column, array):
+                    numbers, positions = parse_numerical(values)
+                    column.extend(numbers)
+                    if positions:
+                        missing.setdefault(index, array('q')).extend(num_rows + position for position in positions)
+                else:
+                    column.extend(values)
+            num_rows += len(rows)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return columns, missing, attribute_names, attribute_types
+
+
+# Streaming reader: read the dataset batch after batch
+def read_batches(data_path, names_path, batch_size=BATCH_SIZE, chunk_size=CHUNK_SIZE):
+    """ Yield the data cases of the *.data file in lists of batch_size rows (the last one may be shorter),
+        in the format of the data_list of read_files, so that only one batch is in memory at a time. """
+    attribute_names, attribute_types = read_names_file(names_path)
+    batch = []
+    for rows in read_chunks(data_path, chunk_size):
+        # convert the numerical attribute columns like convert_to_numerical
+        for column in range(len(rows[0]) - 1):
+            if attribute_types[column] != 'numerical':
+                continue
+            values = [row[column] for row in rows]
+            try:
+                values = list(map(float, values))
+            except ValueError:
+                values = [value if value == '?' else float(value) for value in values]
+            for row, value in zip(rows, values):
+                row[column] = value
+        batch.extend(rows)
+        start = 0
+        while len(batch) - start >= batch_size:
+            yield batch[start:start + batch_size]
+            start += batch_size
+        batch = batch[start:]
+    if batch:
+        yield batch
+
+
 # Testing
 if __name__ == '__main__':
     test_data_path = 'dataset/pima.data'
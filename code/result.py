@@ -1,37 +1,34 @@
 import time
 import random
-from readfile import read_files
-from CBA_CB_M2 import check_cover
+from readfile import read_columns
+import predictor
 from CBA_CB_M2 import build_classifier_M2
-from preprocessing import preprocessing_main
+from preprocessing import preprocessing_columns
 from rulegenerator import rule_generator_main
 
 def calcualte_accuracy(classifier, data_list):
     """ Calculate the error rate of the classifier on the data_list used. """
     data_size = len(data_list)
     num_errors = 0
-    # iterate through each data line in the data_list
-    for data in data_list:
-        is_covered = False
-        # iterate through each rule in the rule_list
-        for rule in classifier.rule_list:
-            # check whether the rule correctly classify the data line
-            is_covered = check_cover(data, rule)
-            if is_covered == True:
-                break
-        # if the data is not covered by any rule in the rule_list
-        if is_covered == False: 
-            # and the data class label and default class label are different
-            if classifier.default_label != data[-1]:
-                num_errors += 1
+    # classify every data line by the first rule covering it, or the default class label
+    predicted_labels = predictor.compile_classifier(classifier).predict(data_list)
+    for data, label in zip(data_list, predicted_labels):
+        # the data class label and the predicted class label are different
+        if label != data[-1]:
+            num_errors += 1
     return 1-(num_errors / data_size)
     
 
-def cross_validation_M2_with_pruning(data_path, names_path, minsup=0.01, minconf=0.5):
-    """ 10-fold cross-validation on CBA-CB-M2 Classifier with rule pruning. """
-    data_list, attributes, attribute_types = read_files(data_path, names_path)
+def cross_validation_M2_with_pruning(data_path, names_path, minsup=0.01, minconf=0.5, engine="apriori", columnar=False):
+    """ 10-fold cross-validation on CBA-CB-M2 Classifier with rule pruning.
+    engine: the rule generator, "apriori", "eclat" or "fpgrowth" (see rule_generator_main).
+    columnar: hold the preprocessed data in a columnar.ColumnarData instead of a data_list (needs NumPy). """
+    columns, missing, attributes, attribute_types = read_columns(data_path, names_path)
+    data_list = preprocessing_columns(columns, missing, attributes, attribute_types)
     random.shuffle(data_list)
-    data_list = preprocessing_main(data_list, attributes, attribute_types)
+    if columnar:
+        from columnar import to_columnar
+        data_list = to_columnar(data_list)
     data_size = len(data_list)
     # validation_size = data_size / 10 as we are doing 10-fold cross validation
     validation_size = int(data_size / 10)
@@ -55,7 +52,7 @@ def cross_validation_M2_with_pruning(data_path, names_path, minsup=0.01, minconf
         
         # compute the single and total runtime for rule generator with rule pruning
         start_time = time.time()
-        CARs = rule_generator_main(training_data, minsup, minconf)
+        CARs = rule_generator_main(training_data, minsup, minconf, engine=engine)
         CARs.prune_rules(training_data)
         CARs.CARs_rule = CARs.pruned_CARs
         end_time = time.time()
@@ -0,0 +1,174 @@
+"""
+Rule budget shared by the rule generators (rulegenerator.py for CBA and Part5_FP_Tree.py for CMAR).
+Input: the maximum number of rules and/or the maximum memory the rules may take
+Output: the best rules by the CBA precedence, kept in a bounded heap
+
+A rule r1 has a higher precedence than r2 if
+    1. the confidence of r1 > r2, or
+    2. the confidences are the same, but the support of r1 > r2, or
+    3. both are the same, but r1 is shorter (generated earlier) than r2, or
+    4. everything is the same, but r1 comes first by tie_key: its sorted condset items, then its class label.
+The last criterion is canonical instead of the order the rules are added in,
+so that every rule generator keeps the same rules in a full budget.
+"""
+import heapq
+import sys
+
+# default number of rules kept by the rule generators, the limit used to be hard-coded
+DEFAULT_MAX_RULES = 2000
+# default number of candidates counted in one level (CBA) or patterns enumerated for one base (CMAR), None for no limit.
+# The limit is only an approximate memory guard: the candidates are ranked by an upper bound of their support (CBA)
+# or taken in the order of the FP-tree (CMAR), not by precedence, so it may drop rules the rule budget would keep.
+# Without it, the rules kept only depend on the rule budget. Set it for a dataset whose search does not fit in memory,
+# e.g. wine at minsup 0.01 in Part5_CMAR_Main.py
+DEFAULT_MAX_CANDIDATES = None
+
+
+def label_key(label):
+    """ Sort key of a class label, comparing the type name first,
+    so that the labels of a dataset with labels of different types (e.g. int and str) are always comparable. """
+    return type(label).__name__, label
+
+
+def tie_key(items, label):
+    """ The last criterion of the precedence of the rule of these (column, value) items and class label,
+    the smaller the key, the higher the precedence. """
+    return tuple(sorted(items)), label_key(label)
+
+
+class Descending:
+    """ A key compared the other way round, so that the largest tie_key is on top of the min-heap. """
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __gt__(self, other):
+        return other.key > self.key
+
+
+def rule_size(rule):
+    """ Approximate memory of a rule in bytes: the rule object and every field it holds. """
+    size = sys.getsizeof(rule)
+    if hasattr(rule, '__dict__'):
+        fields = vars(rule).values()
+    else:
+        fields = rule
+    for field in fields:
+        size += sys.getsizeof(field)
+    return size
+
+
+class RuleBudget:
+    """
+    A min-heap of (confidence, support, -length, Descending(tie_key), -order, rule) with the lowest precedence rule
+    on top, so that the worst rule is evicted in O(log n) when the budget is exceeded.
+    The insertion order -order only keeps the rules themselves from being compared.
+    max_rules: the maximum number of rules kept, None for no limit
+    max_memory: the maximum memory in bytes of the rules kept (estimated by rule_size), None for no limit
+    max_candidates: the maximum number of candidates counted in a level (CBA) or patterns enumerated for a base
+    attribute (CMAR), an approximate memory guard, None for no limit
+    """
+    def __init__(self, max_rules=DEFAULT_MAX_RULES, max_memory=None, max_candidates=DEFAULT_MAX_CANDIDATES):
+        self.max_rules = max_rules
+        self.max_memory = max_memory
+        self.max_candidates = max_candidates
+        self.heap = []
+        # {id(rule): size}, rules that are removed stay in the heap and are skipped when they reach the top
+        self.alive = dict()
+        self.memory = 0
+        self.order = 0
+
+    def get_num(self):
+        """ Number of rules kept. """
+        return len(self.alive)
+
+    def is_full(self):
+        """ Check whether a new rule can only be kept by evicting another one. """
+        if self.max_rules is not None and len(self.alive) >= self.max_rules:
+            return True
+        if self.max_memory is not None and self.memory >= self.max_memory:
+            return True
+        return False
+
+    def _clean_top(self):
+        """ Drop the removed rules from the top of the heap. """
+        while self.heap and id(self.heap[0][-1]) not in self.alive:
+            heapq.heappop(self.heap)
+
+    def worst(self):
+        """ Return (confidence, support) of the lowest precedence rule kept, None when the budget is empty. """
+        self._clean_top()
+        if not self.heap:
+            return None
+        return self.heap[0][0], self.heap[0][1]
+
+    def admits(self, confidence, support, length, key):
+        """ Check whether a new rule would be kept, i.e. it precedes the worst rule of a full budget.
+        key: the tie_key of the rule.
+        This is the effective minimum confidence (and support on equal confidence) of the generator. """
+        if not self.is_full():
+            return True
+        self._clean_top()
+        if not self.heap:
+            # full without any rule kept (max_rules 0, or max_memory reached)
+            return False
+        return (confidence, support, -length, Descending(key)) > self.heap[0][:4]
+
+    def prunes_branch(self, support, length):
+        """ Check whether neither a ruleitem of this support and length nor any rule extending it can be kept anymore.
+        Extending a ruleitem never increases its support, so once the worst rule kept has the maximum confidence 1,
+        the support of the worst rule is the effective minimum support: a ruleitem with less support, or the same
+        support but longer than the worst rule, cannot precede it, and neither can any of its extensions.
+        A ruleitem of the same support and length may still precede it by tie_key, only its extensions cannot. """
+        if not self.is_full():
+            return False
+        self._clean_top()
+        if not self.heap:
+            return True
+        worst = self.heap[0]
+        return worst[0] >= 1 and (support, -length) < worst[1:3]
+
+    def push(self, rule, confidence, support, length, key):
+        """ Add a rule, then evict the lowest precedence rules while the budget is exceeded.
+        key: the tie_key of the rule.
+        Return the list of evicted rules, which may include the new rule itself. """
+        if not self.admits(confidence, support, length, key):
+            return [rule]
+        size = rule_size(rule) if self.max_memory is not None else 0
+        self.order += 1
+        heapq.heappush(self.heap, (confidence, support, -length, Descending(key), -self.order, rule))
+        self.alive[id(rule)] = size
+        self.memory += size
+        evicted = []
+        while self._exceeded():
+            self._clean_top()
+            worst_rule = heapq.heappop(self.heap)[-1]
+            self.memory -= self.alive.pop(id(worst_rule))
+            evicted.append(worst_rule)
+        return evicted
+
+    def remove(self, rule):
+        """ Remove a rule that has been replaced by the generator. """
+        if id(rule) in self.alive:
+            self.memory -= self.alive.pop(id(rule))
+
+    def _exceeded(self):
+        """ Check whether more rules are kept than the budget allows. """
+        if self.max_rules is not None and len(self.alive) > self.max_rules:
+            return True
+        if self.max_memory is not None and self.memory > self.max_memory and len(self.alive) > 1:
+            return True
+        return False
+
+    def get_rules(self):
+        """ Return the rules kept, sorted from the highest precedence to the lowest. """
+        entries = [entry for entry in self.heap if id(entry[-1]) in self.alive]
+        entries.sort(key=lambda entry: entry[:4], reverse=True)
+        return [entry[-1] for entry in entries]
@@ -4,14 +4,22 @@ Input: preprocessed data, minimum support and minimum confidence
 Output: Class Association Rules (CARs)
 """
 
+import time
+import heapq
+import bitset
 import ruleitem
+import rulebudget
+import streaming
+import columnar
 
 class FrequentRuleitemSet:
     """
     A set of frequent k-ruleitems, just using set.
+    rule_index maps (canonical condset, label) to the ruleitem, so that duplicates are found in O(1).
     """
     def __init__(self):
         self.rule_set = set()
+        self.rule_index = dict()
 
     
     def get_num(self):
@@ -22,153 +30,394 @@ class FrequentRuleitemSet:
     def add(self, new_item):
         """ Add a new ruleitem into set. """
         # do not add if the ruleitem is already in the set
-        is_in_set = False
-        for item in self.rule_set:
-            if item.label == new_item.label:
-                if item.condset == new_item.condset:
-                    is_in_set = True
-                    break
-        if not is_in_set:
+        key = (ruleitem.condset_key(new_item.condset), new_item.label)
+        if key not in self.rule_index:
+            self.rule_index[key] = new_item
             self.rule_set.add(new_item)
 
 
 class CARs:
     """
     set of Class Association Rules
+    CARs_index maps the canonical condset to the only rule kept for it, so that duplicates are found in O(1).
+    budget: a rulebudget.RuleBudget keeping only the best rules, None to keep every rule
+    count_cache: the CountCache filled by the rule generator, reused by prune_rules
     """
-    def __init__(self):
+    def __init__(self, budget=None, count_cache=None):
         self.CARs_rule = set()
+        self.CARs_index = dict()
         self.pruned_CARs = set()
+        self.budget = budget
+        self.count_cache = count_cache
 
     def add_CARs_rule(self, rule_item, min_support, min_confidence):
         # basic requirement
         if rule_item.support >= min_support and rule_item.confidence >= min_confidence:
-            # do not add if the rule is already in the CARs rule set
-            if rule_item in self.CARs_rule:
-                return
-            # save the ruleitem with the highest confidence when having the same condset
-            for item in self.CARs_rule:
-                if item.condset == rule_item.condset and item.confidence < rule_item.confidence:
-                    self.CARs_rule.remove(item)
-                    self.CARs_rule.add(rule_item)
+            # the effective minimum confidence and support rise as the budget fills
+            if self.budget is not None:
+                tie_key = rulebudget.tie_key(rule_item.condset.items(), rule_item.label)
+                if not self.budget.admits(rule_item.confidence, rule_item.support, len(rule_item.condset), tie_key):
+                    return
+            key = ruleitem.condset_key(rule_item.condset)
+            item = self.CARs_index.get(key)
+            # save the ruleitem with the highest confidence when having the same condset, then the highest support,
+            # then the smallest class label (rulebudget.label_key), so that the rule kept does not depend on
+            # the order the ruleitems are generated in. This also skips the rule already in the CARs rule set
+            if item is not None:
+                if (item.confidence, item.support) > (rule_item.confidence, rule_item.support):
                     return
-                elif item.condset == rule_item.condset and item.confidence >= rule_item.confidence:
+                if ((item.confidence, item.support) == (rule_item.confidence, rule_item.support)
+                        and rulebudget.label_key(item.label) <= rulebudget.label_key(rule_item.label)):
                     return
+                self.remove_CARs_rule(item)
+            self.CARs_index[key] = rule_item
             self.CARs_rule.add(rule_item)
+            if self.budget is not None:
+                # evict the lowest precedence rules out of the budget
+                evicted = self.budget.push(rule_item, rule_item.confidence, rule_item.support, len(rule_item.condset),
+                                           tie_key)
+                for item in evicted:
+                    self.remove_CARs_rule(item)
+
+
+    def remove_CARs_rule(self, rule_item):
+        """ Remove a rule from the CARs rule set. """
+        self.CARs_rule.discard(rule_item)
+        key = ruleitem.condset_key(rule_item.condset)
+        if self.CARs_index.get(key) is rule_item:
+            del self.CARs_index[key]
+        if self.budget is not None:
+            self.budget.remove(rule_item)
 
 
     def copy_freq_rules(self, frequent_ruleitems, min_support, min_confidence):
         """ Copy the frequent k-ruleitems set to CARs rule set. """
-        for item in frequent_ruleitems.rule_set:
+        for item in frequent_ruleitems.rule_index.values():
             self.add_CARs_rule(item, min_support, min_confidence)
             
 
     def prune_rules(self, dataset):
+        # reuse the counts of the rule generator when pruning on the data_list the rules were mined from
+        if self.count_cache is not None and self.count_cache.data_list is dataset:
+            count_cache = self.count_cache
+        else:
+            count_cache = CountCache(dataset)
         for rule in self.CARs_rule:
-            if not should_prune(rule, dataset):
+            if not should_prune(rule, count_cache):
                 # add the useful rules into a new set
                 self.pruned_CARs.add(rule)
 
     def join(self, car, min_support, min_confidence):
         """ Add all the ruleitems from another CARs set. """
-        for item in car.CARs_rule:
+        for item in car.CARs_index.values():
             self.add_CARs_rule(item, min_support, min_confidence)
 
+
+class CountCache:
+    """
+    Per-run cache of the ruleitems counted on one data_list: {(condset key, label): (rulesupCount, number of errors)},
+    where the errors are the data cases covered by the condset with another label.
+    It is filled with the counts of the rule generator, the missing ones are counted on the bitmaps of the data_list.
+    """
+    def __init__(self, data_list):
+        self.data_list = data_list
+        self.counts = dict()
+        self.bitset_data = None
+
+    def add(self, key, label, condsupCount, rulesupCount):
+        """ Record the counts of the ruleitem with the condset key and the label. """
+        self.counts[(key, label)] = (rulesupCount, condsupCount - rulesupCount)
+
+    def get_errors(self, condset, label):
+        """ Get the number of errors of the ruleitem, counting it only on a cache miss. """
+        key = ruleitem.condset_key(condset)
+        if (key, label) not in self.counts:
+            # the bitmaps are only built when the first miss happens
+            if self.bitset_data is None:
+                self.bitset_data = bitset.BitsetData(self.data_list)
+            condsupCount, rulesupCount = self.bitset_data.count(condset, label)
+            self.add(key, label, condsupCount, rulesupCount)
+        return self.counts[(key, label)][1]
+
+
 # get how many data cases do not cover the ruleitem
 def get_rule_errors(r, dataset):
-    import CBA_CB_M2
-
-    error_num = 0
-    for case in dataset:
-        if CBA_CB_M2.check_cover(case, r) == False:
-            error_num += 1
-    return error_num
+    """ dataset: a CountCache, or a data_list counted on its bitmaps """
+    if not isinstance(dataset, CountCache):
+        dataset = CountCache(dataset)
+    return dataset.get_errors(r.condset, r.label)
 
 # return True if the rule should be pruned
 def should_prune(rule, dataset):
-    min_rule_error = get_rule_errors(rule, dataset)
+    if not isinstance(dataset, CountCache):
+        dataset = CountCache(dataset)
+    min_rule_error = dataset.get_errors(rule.condset, rule.label)
 
     if len(rule.condset) > 1:
         for attribute in rule.condset:
             temp_condset = dict(rule.condset) # copy the condset
             temp_condset.pop(attribute)
-            temp_rule = ruleitem.RuleItem(temp_condset, rule.label, dataset)
-            temp_rule_error = get_rule_errors(temp_rule, dataset)
+            temp_rule_error = dataset.get_errors(temp_condset, rule.label)
             if temp_rule_error < min_rule_error:
                 return True
 
     return False
 
 
-""" Invoked by candidateGen, join two items to generate candidate. """
-def join(item1, item2, data_list):
-    # 2 ruleItem shall have the same class label
-    if item1.label != item2.label:
-        return None
-    category1 = set(item1.condset)
-    category2 = set(item2.condset)
-    # 2 ruleItem cannot be the same
-    if category1 == category2:
+""" Invoked by candidateGen, join two k-condsets sharing the same (k-1)-prefix to generate a candidate condset. """
+def join(key1, key2):
+    # both condsets are canonical, sorted by column, and share everything but the last item
+    last1 = key1[-1]
+    last2 = key2[-1]
+    # the same attribute cannot take two values
+    if last1[0] == last2[0]:
         return None
-    # same attribute should have the same value
-    shared_attributes = category1 & category2
-    for col in shared_attributes:
-        if item1.condset[col] != item2.condset[col]:
-            return None
-    # join 2 ruleItems
-    combined_attributes = category1 | category2
-    new_condset = {}
-    for col in combined_attributes:
-        if col in category1:
-            new_condset[col] = item1.condset[col]
-        else:
-            new_condset[col] = item2.condset[col]
-    # generate new ruleitem
-    new_ruleitem = ruleitem.RuleItem(new_condset, item1.label, data_list)
-    return new_ruleitem
-
-# similar to Apriori-gen in algorithm Apriori
-def candidateGen(frequent_ruleitems, data_list):
-    results = FrequentRuleitemSet()
-    for item1 in frequent_ruleitems.rule_set:
-        for item2 in frequent_ruleitems.rule_set:
-            new_ruleitem = join(item1, item2, data_list)
-            if new_ruleitem: # not null
-                results.add(new_ruleitem)
-                if results.get_num() >= 2000: # 2000 rules limit
-                    return results
+    # the new condset stays sorted by column
+    if last1[0] < last2[0]:
+        return key1 + (last2,)
+    return key2 + (last1,)
+
+
+def has_infrequent_subset(new_key, label, frequent_ruleitems):
+    """ Check whether a k-subset of the candidate (k+1)-condset is not frequent with the same label.
+    The two subsets obtained by dropping one of the last two items are the joined ruleitems themselves. """
+    for index in range(len(new_key) - 2):
+        subset_key = new_key[:index] + new_key[index + 1:]
+        if (subset_key, label) not in frequent_ruleitems.rule_index:
+            return True
+    return False
+
+
+# Apriori-gen in algorithm Apriori
+def candidateGen(frequent_ruleitems, max_candidates=None, budget=None):
+    """ Return the list of candidate (condset key, label), their support is counted by count_candidates.
+    The support of a candidate is at most the smaller support of the two joined ruleitems.
+    budget: skip the candidates whose upper bound of support cannot enter the full rule budget,
+    count_frequent_ruleitems would skip them after counting (RuleBudget.prunes_branch), so no rule is lost.
+    max_candidates: an approximate memory guard, when there are more candidates, keep the ones with
+    the highest upper bound of rulesupCount. This is not the precedence, so it may drop rules the budget would keep. """
+    results = []
+    # group the frequent k-ruleitems by class label and (k-1)-prefix,
+    # only ruleitems in the same group can be joined. Sorted by condset only,
+    # the class labels are not always comparable with each other
+    groups = dict()
+    for key, label in sorted(frequent_ruleitems.rule_index, key=lambda rule_key: rule_key[0]):
+        groups.setdefault((label, key[:-1]), []).append(key)
+    for (label, prefix), keys in groups.items():
+        for i in range(len(keys)):
+            for j in range(i + 1, len(keys)):
+                new_key = join(keys[i], keys[j])
+                if new_key is None:
+                    continue
+                # prune the candidate before counting its support
+                if has_infrequent_subset(new_key, label, frequent_ruleitems):
+                    continue
+                if budget is not None:
+                    support = min(frequent_ruleitems.rule_index[(keys[i], label)].support,
+                                  frequent_ruleitems.rule_index[(keys[j], label)].support)
+                    if budget.prunes_branch(support, len(new_key)):
+                        continue
+                results.append((new_key, label))
+    if max_candidates is not None and len(results) > max_candidates:
+        def upper_bound(candidate):
+            new_key, label = candidate
+            item1 = frequent_ruleitems.rule_index[(new_key[:-1], label)]
+            item2 = frequent_ruleitems.rule_index[(new_key[:-2] + new_key[-1:], label)]
+            return min(item1.rulesupCount, item2.rulesupCount)
+        # nlargest is stable, the ties stay in generation order
+        results = heapq.nlargest(max_candidates, results, key=upper_bound)
     return results
 
-# main function to run the rule generator
-def rule_generator_main(data_list, min_support, min_confidence):
+
+class TrieNode:
+    """
+    Node of the prefix trie of candidate condsets.
+    """
+    def __init__(self):
+        self.child = dict()  # {(column, value): child node}
+        self.condsupCount = 0
+        self.label_count = None  # {class label: count}, only for the end node of a candidate condset
+
+
+def count_candidates(candidate_keys, data_list):
+    """ Count all the candidate condsets of a level in a single pass over the data_list.
+    The candidates are stored in a prefix trie, each data case only walks down the branches whose items it contains,
+    so the cost is |D| x (candidate prefixes contained in a data case) instead of |D| x |candidates|.
+    Return a dictionary {condset key: (condsupCount, {class label: count})}. """
+    if isinstance(data_list, columnar.ColumnarData):
+        return count_candidates_columnar(candidate_keys, data_list)
+    if isinstance(data_list, streaming.BatchStream):
+        return count_candidates_batches(candidate_keys, data_list.batches())
+    root, end_nodes = build_candidate_trie(candidate_keys)
+    count_trie(root, data_list)
+    return dict((key, (node.condsupCount, node.label_count)) for key, node in end_nodes.items())
+
+
+def build_candidate_trie(candidate_keys):
+    """ Store the candidate condsets in a prefix trie.
+    Return the root and the dictionary {condset key: end node of the candidate}. """
+    root = TrieNode()
+    end_nodes = dict()
+    for key in candidate_keys:
+        node = root
+        for item in key:
+            if item not in node.child:
+                node.child[item] = TrieNode()
+            node = node.child[item]
+        node.label_count = dict()
+        end_nodes[key] = node
+    return root, end_nodes
+
+
+def count_trie(root, data_list):
+    """ Add the data cases of the data_list to the counts of the candidates in the trie. """
+    for data in data_list:
+        label = data[-1]
+        items = list(enumerate(data[:-1]))
+        num_columns = len(items)
+        # (node, first column that can still extend the prefix of the node)
+        node_to_visit = [(root, 0)]
+        while node_to_visit:
+            node, first_column = node_to_visit.pop()
+            for column in range(first_column, num_columns):
+                child = node.child.get(items[column])
+                if child is None:
+                    continue
+                if child.label_count is not None:
+                    child.condsupCount += 1
+                    child.label_count[label] = child.label_count.get(label, 0) + 1
+                if child.child:
+                    node_to_visit.append((child, column + 1))
+
+
+def count_candidates_batches(candidate_keys, batches):
+    """ Count all the candidate condsets of a level over the batches of a streaming.BatchStream,
+    reading one batch at a time. The counts of every batch are added up in the end nodes of one trie:
+    a list batch walks the trie like count_candidates, a columnar batch is counted by count_candidates_columnar.
+    Return the same dictionary as count_candidates. """
+    root, end_nodes = build_candidate_trie(candidate_keys)
+    for batch in batches:
+        if isinstance(batch, columnar.ColumnarData):
+            for key, (condsupCount, label_count) in count_candidates_columnar(candidate_keys, batch).items():
+                node = end_nodes[key]
+                node.condsupCount += condsupCount
+                for label, count in label_count.items():
+                    node.label_count[label] = node.label_count.get(label, 0) + count
+        else:
+            count_trie(root, batch)
+    return dict((key, (node.condsupCount, node.label_count)) for key, node in end_nodes.items())
+
+
+def count_candidates_columnar(candidate_keys, columnar_data):
+    """ Count all the candidate condsets of a level on a columnar.ColumnarData with array operations.
+    The candidates are visited in sorted order, keeping the masks of the data cases containing each prefix
+    of the last candidate, so that a candidate only intersects the masks of the items after the prefix
+    it shares with the previous one. Return the same dictionary as count_candidates. """
+    counts = dict()
+    item_masks = dict()
+    # masks[i]: the data cases containing the first i items of the previous candidate, None for every data case
+    masks = [None]
+    previous = ()
+    for key in sorted(candidate_keys):
+        shared = 0
+        while shared < min(len(key), len(previous)) and key[shared] == previous[shared]:
+            shared += 1
+        del masks[shared + 1:]
+        for item in key[shared:]:
+            if item not in item_masks:
+                item_masks[item] = columnar_data.item_mask(item)
+            masks.append(item_masks[item] if masks[-1] is None else masks[-1] & item_masks[item])
+        previous = key
+        label_count = columnar_data.label_count(masks[-1])
+        counts[key] = (sum(label_count.values()), label_count)
+    return counts
+
+
+def count_frequent_ruleitems(candidates, data_list, min_support, budget=None, count_cache=None):
+    """ Count the candidate (condset key, label) of a level in one pass and keep the frequent ruleitems.
+    budget: skip the ruleitems whose extensions can no longer enter the full rule budget.
+    count_cache: a CountCache recording the counts of every candidate. """
     frequent_ruleitems = FrequentRuleitemSet()
-    new_car = CARs()
+    counts = count_candidates(set(key for key, label in candidates), data_list)
+    for key, label in candidates:
+        condsupCount, label_count = counts[key]
+        sup_counts = (condsupCount, label_count.get(label, 0))
+        if count_cache is not None:
+            count_cache.add(key, label, condsupCount, sup_counts[1])
+        rule_item = ruleitem.RuleItem(dict(key), label, data_list, sup_counts)
+        if rule_item.support >= min_support:
+            if budget is not None and budget.prunes_branch(rule_item.support, len(key)):
+                continue
+            frequent_ruleitems.add(rule_item)
+    return frequent_ruleitems
+
+
+# main function to run the rule generator
+def rule_generator_main(data_list, min_support, min_confidence, verbose=False,
+                        max_rules=rulebudget.DEFAULT_MAX_RULES, max_memory=None,
+                        max_candidates=rulebudget.DEFAULT_MAX_CANDIDATES, engine="apriori"):
+    """ verbose: print the number of candidates, frequent ruleitems and the runtime of each level.
+    max_rules, max_memory: the rule budget, only the best rules by precedence are kept (None for no limit)
+    max_candidates: the maximum number of candidates counted in a level, an approximate memory guard
+    that may drop rules the rule budget would keep (None for no limit, the default)
+    engine: "apriori" for the level-wise generator below, "eclat" for the depth-first vertical generator in eclat.py,
+    "fpgrowth" for the FP-growth generator in fpgrowth.py, the last two ignore verbose.
+    Every engine returns the same CARs for the same arguments: max_candidates, which drops rules the other engines
+    would keep, is only accepted by the apriori engine """
+    if engine != "apriori" and max_candidates is not None:
+        raise ValueError("max_candidates is only supported by the apriori engine, not %s" % engine)
+    if engine == "eclat":
+        import eclat
+        return eclat.rule_generator_eclat(data_list, min_support, min_confidence, max_rules, max_memory)
+    if engine == "fpgrowth":
+        import fpgrowth
+        return fpgrowth.rule_generator_fpgrowth(data_list, min_support, min_confidence, max_rules, max_memory)
+    start_time = time.time()
+    budget = rulebudget.RuleBudget(max_rules, max_memory, max_candidates)
+    # the counts of every candidate, reused when pruning the rules
+    count_cache = CountCache(data_list)
+    # stores all the CARs
+    all_CARs = CARs(budget, count_cache)
 
     # get large 1-ruleitems and generate CARs_rule
-    labels = set([x[-1] for x in data_list]) # set of all lables for each data
-    for column in range(0, len(data_list[0])-1):
-        distinct_value = set([x[column] for x in data_list]) # set of all values under a column for each data
+    candidates = []
+    if isinstance(data_list, streaming.BatchStream):
+        # a single pass over the file for all the columns
+        labels, column_values = data_list.distinct_values()
+    elif isinstance(data_list, columnar.ColumnarData):
+        labels = data_list.get_labels()
+        column_values = [set(data_list.value_count(column)) for column in range(0, len(data_list[0])-1)]
+    else:
+        labels = set([x[-1] for x in data_list]) # set of all lables for each data
+        # set of all values under a column for each data
+        column_values = [set([x[column] for x in data_list]) for column in range(0, len(data_list[0])-1)]
+    for column, distinct_value in enumerate(column_values):
         for value in distinct_value:
-            condset = {column: value}
             for label in labels:
-                rule_item = ruleitem.RuleItem(condset, label, data_list) # all possible 1-ruleitems
-                if rule_item.support >= min_support:
-                    frequent_ruleitems.add(rule_item)
-    new_car.copy_freq_rules(frequent_ruleitems, min_support, min_confidence)
-    # stores all the CARs 1-ruleitems
-    all_CARs = new_car
-
-    current_CARs_num = len(all_CARs.CARs_rule)
-    while frequent_ruleitems.get_num() > 0 and current_CARs_num <= 2000: # 2000 rules limit
-        candidate = candidateGen(frequent_ruleitems, data_list)
-        frequent_ruleitems = FrequentRuleitemSet()
-        new_car = CARs()
+                candidates.append((((column, value),), label)) # all possible 1-ruleitems
+    frequent_ruleitems = count_frequent_ruleitems(candidates, data_list, min_support, count_cache=count_cache)
+    # CARs 1-ruleitems
+    all_CARs.copy_freq_rules(frequent_ruleitems, min_support, min_confidence)
+    level = 1
+    if verbose:
+        print_level(level, len(candidates), frequent_ruleitems.get_num(), time.time() - start_time)
+
+    while frequent_ruleitems.get_num() > 0:
+        start_time = time.time()
+        # gather all the candidates of the level first, then count them together
+        candidates = candidateGen(frequent_ruleitems, max_candidates, budget)
         # add the candidate ruleitems that meet the basic requirements
-        for item in candidate.rule_set:
-            if item.support >= min_support:
-                frequent_ruleitems.add(item)
+        frequent_ruleitems = count_frequent_ruleitems(candidates, data_list, min_support, budget, count_cache)
+        new_car = CARs()
         new_car.copy_freq_rules(frequent_ruleitems, min_support, min_confidence)
         all_CARs.join(new_car, min_support, min_confidence)
-        current_CARs_num = len(all_CARs.CARs_rule)
+        level += 1
+        if verbose:
+            print_level(level, len(candidates), frequent_ruleitems.get_num(), time.time() - start_time)
 
     return all_CARs
+
+
+def print_level(level, num_candidates, num_frequent, runtime):
+    """ Report the size and the runtime of one level of the rule generator. """
+    print("Level %d: %d candidates, %d frequent ruleitems, %.3lf s" % (level, num_candidates, num_frequent, runtime))
@@ -1,25 +1,38 @@
+import bitset
+import columnar
+
+
 class RuleItem: 
     """ 
     Build the class RuleItem, including condset, class label y, condsupCount, rulesupCount, support and confidence. 
-    Input: condset which include a set of items, label and the data_list.
+    Input: condset which include a set of items, label and the data_list
+    (or its vertical representation bitset.BitsetData, or its columnar representation columnar.ColumnarData,
+    which avoid scanning the data cases one by one).
     Output: a ruleitem with the value of condsupCount, rulesupCount, support and confidence. 
     """
-    def __init__(self, condset, label, data_list):
+    def __init__(self, condset, label, data_list, sup_counts=None):
         """ According to the paper, each frequent k-ruleitems consists of the following:
         condset: a dictiondary that has key-value pair {"item name: value, item name: value...},
         where the item name are name of the column attributes.
         condsupCount: the support count of condset
         rulesupCount: the support count of the ruleitem
-        y : the class label """
+        y : the class label
+        sup_counts: (condsupCount, rulesupCount) when they are already counted, data_list is then only used for its size """
         self.condset = condset
         self.label = label
-        self.condsupCount, self.rulesupCount = self.calculate_supCount(data_list)
+        if sup_counts is None:
+            sup_counts = self.calculate_supCount(data_list)
+        self.condsupCount, self.rulesupCount = sup_counts
         self.confidence = self.calculate_confidence()
         self.support = self.calculate_support(data_list)
 
 
     def calculate_supCount(self, data_list):
         """ Count the condsupCount and rulesupCount respectively. """
+        # with the vertical representation, intersect the bitmaps instead of scanning every data case,
+        # with the columnar representation, compare whole columns
+        if isinstance(data_list, (bitset.BitsetData, columnar.ColumnarData)):
+            return data_list.count(self.condset, self.label)
         # Initialization
         condsupCount = 0
         rulesupCount = 0
@@ -62,6 +75,6 @@ class RuleItem:
         return support
 
 
-
-
-
+def condset_key(condset):
+    """ Hashable canonical form of a condset: the tuple of its (column, value) items sorted by column. """
+    return tuple(sorted(condset.items()))
@@ -0,0 +1,88 @@
+"""
+Out-of-core rule mining over data files larger than memory.
+Input: a *.data file, its *.names file and the encoding of the data (see preprocessing.find_encoding_streaming)
+Output: the preprocessed data cases, in batches of a fixed number of rows read from the file again on every pass
+
+A BatchStream is used in place of the preprocessed data_list by the rule generators. The level-wise CBA-RG
+(rulegenerator.rule_generator_main) counts the candidates of each level batch after batch, and the FP-trees of
+CMAR (Part5_FP_Tree.ordered_F_list and create_FP_tree) and of fpgrowth.py are built from the batches, so only
+one batch of data cases is in memory at a time, besides the candidates, the trees and the rules.
+The stages comparing rules with every data case one at a time (Part5_FP_Tree.prune_x2, Part5_CR_Tree.last_pruning)
+read the whole file for each rule, and those using the bitmaps of bitset.BitsetData (eclat.py, CBA_CB_M2.py and
+the rule pruning on a count miss) hold one bit per data case and item.
+"""
+
+import columnar
+import discretization
+import preprocessing
+import readfile
+
+
+class BatchStream:
+    """
+    data_path, names_path: the *.data and *.names files
+    encoding: the encoding of preprocessing_main, applied to each batch by preprocessing.apply_encoding
+    batch_size: the number of data cases in a batch
+    as_columnar: yield each batch as a columnar.ColumnarData instead of a list (needs NumPy)
+    num_columns: the number of columns, the class label column included
+    size: the number of data cases, None until a pass over the file is complete
+    """
+    def __init__(self, data_path, names_path, encoding, batch_size=readfile.BATCH_SIZE, as_columnar=False):
+        if as_columnar and not columnar.AVAILABLE:
+            raise ImportError("as_columnar needs NumPy")
+        self.data_path = data_path
+        self.names_path = names_path
+        self.encoding = encoding
+        self.batch_size = batch_size
+        self.as_columnar = as_columnar
+        # from the first data case, like len(data_list[0])
+        first_batches = readfile.read_batches(data_path, names_path, 1)
+        first_batch = next(first_batches, None)
+        first_batches.close()
+        self.num_columns = len(first_batch[0]) if first_batch else 0
+        self.size = None
+
+    def batches(self):
+        """ Read the data file once, yielding the preprocessed batches. """
+        size = 0
+        for rows in readfile.read_batches(self.data_path, self.names_path, self.batch_size):
+            batch = preprocessing.apply_encoding(rows, self.encoding)
+            size += len(batch)
+            if self.as_columnar:
+                batch = columnar.to_columnar(batch)
+            yield batch
+        self.size = size
+
+    def __iter__(self):
+        """ Iterate over the preprocessed data cases, one batch in memory at a time. """
+        for batch in self.batches():
+            yield from batch
+
+    def __len__(self):
+        """ Number of data cases, counted by a pass over the file when it is not known yet. """
+        if self.size is None:
+            for batch in self.batches():
+                pass
+        return self.size
+
+    def distinct_values(self):
+        """ Find the distinct class labels and the distinct values of each attribute column in one pass.
+        Return the set of class labels and the list of the sets of values of the columns. """
+        labels = set()
+        column_values = [set() for column in range(self.num_columns - 1)]
+        for batch in self.batches():
+            for data in batch:
+                for column, values in enumerate(column_values):
+                    values.add(data[column])
+                labels.add(data[-1])
+        return labels, column_values
+
+
+def open_stream(data_path, names_path, batch_size=readfile.BATCH_SIZE, as_columnar=False,
+                max_bins=discretization.DEFAULT_MAX_BINS, max_memory=discretization.DEFAULT_MAX_MEMORY,
+                boundary_only=False):
+    """ Find the encoding of the data file in one pass (see preprocessing.find_encoding_streaming)
+    and return the BatchStream of its preprocessed data cases. """
+    encoding = preprocessing.find_encoding_streaming(data_path, names_path, max_bins, batch_size, max_memory,
+                                                     boundary_only)
+    return BatchStream(data_path, names_path, encoding, batch_size, as_columnar)
@@ -0,0 +1,155 @@
+import copy
+import random
+
+import CBA_CB_M2
+import predictor
+import rulegenerator
+
+
+def check_cover(data_line, rule):
+    """ check_cover of the original code: None if the rule does not cover the data line,
+    True if it classifies it correctly, False otherwise. """
+    if any(data_line[column] != value for column, value in rule.condset.items()):
+        return None
+    return data_line[-1] == rule.label
+
+
+def compare_rules(r1, r2):
+    """ compare_rules of the original code: 1 if r1 has a higher precedence than r2, 0 if the same, -1 otherwise,
+    a missing rule (None) has the lowest precedence. """
+    if r1 is None or r2 is None:
+        return (r1 is not None) - (r2 is not None)
+    key1 = (r1.confidence, r1.support, -len(r1.condset))
+    key2 = (r2.confidence, r2.support, -len(r2.condset))
+    return (key1 > key2) - (key1 < key2)
+
+
+def find_wSet(U, data, cRule, CARs_list):
+    """ find_wSet of the original code: the rules of U classifying the data line wrongly,
+    with a higher precedence than its cRule. """
+    return set(index for index in U
+               if compare_rules(CARs_list[index], cRule) > 0 and check_cover(data, CARs_list[index]) is False)
+
+
+def reference_M2(CARs, data_list):
+    """ build_classifier_M2 of the original code, scanning the data cases for every rule,
+    on a copy of the data_list and without its removal of the covered data cases shifting the indices. """
+    data_list = copy.deepcopy(data_list)
+    classifier_M2 = CBA_CB_M2.Classifier_M2()
+    CARs_list = [CBA_CB_M2.Rule(rule.condset, rule.label, data_list) for rule in CBA_CB_M2.M1_sort_CARs(CARs)]
+    labels = list(dict.fromkeys(data[-1] for data in data_list))
+
+    # Stage 1: scan the rules for the cRule and the wRule of every data case
+    Q, U, A, mark = set(), set(), set(), set()
+    for data_index, data in enumerate(data_list):
+        cRule_index = next((index for index, rule in enumerate(CARs_list)
+                            if check_cover(data, rule) is True), None)
+        wRule_index = next((index for index, rule in enumerate(CARs_list)
+                            if check_cover(data, rule) is False), None)
+        if cRule_index is not None:
+            U.add(cRule_index)
+        if cRule_index:
+            CARs_list[cRule_index].num_label_covered[data[-1]] += 1
+        if cRule_index and wRule_index:
+            if compare_rules(CARs_list[cRule_index], CARs_list[wRule_index]) == 1:
+                Q.add(cRule_index)
+                mark.add(cRule_index)
+            else:
+                A.add((data_index, data[-1], cRule_index, wRule_index))
+        elif cRule_index is None and wRule_index is not None:
+            A.add((data_index, data[-1], cRule_index, wRule_index))
+
+    # Stage 2: compare every rule of U
+    for collection in A:
+        if CARs_list[collection[3]] in mark:
+            if collection[2] is not None:
+                CARs_list[collection[2]].num_label_covered[collection[1]] -= 1
+            CARs_list[collection[3]].num_label_covered[collection[1]] += 1
+        else:
+            cRule = CARs_list[collection[2]] if collection[2] is not None else None
+            wSet = find_wSet(U, data_list[collection[0]], cRule, CARs_list)
+            for rule_w in wSet:
+                CARs_list[rule_w].replace.add((collection[2], collection[0], collection[1]))
+                CARs_list[rule_w].num_label_covered[collection[1]] += 1
+            Q |= wSet
+
+    # Stage 3: blank the covered data cases and count everything again after every rule
+    num_rule_errors = 0
+    data_line_covered = [False] * len(data_list)
+    for rule_index in sorted(Q):
+        rule = CARs_list[rule_index]
+        if rule.num_label_covered[rule.label] == 0:
+            continue
+        for entry in rule.replace:
+            if data_line_covered[entry[1]]:
+                rule.num_label_covered[entry[2]] -= 1
+            elif entry[0] is not None:
+                CARs_list[entry[0]].num_label_covered[entry[2]] -= 1
+        for data_index, data in enumerate(data_list):
+            if data and check_cover(data, rule):
+                data_list[data_index] = []
+                data_line_covered[data_index] = True
+        num_rule_errors += sum(1 for data in data_list if data and check_cover(data, rule) is False)
+        remaining = [data[-1] for data in data_list if data]
+        label_count = dict((label, remaining.count(label)) for label in labels if label in remaining)
+        default_label = CBA_CB_M2.default_label_selection(label_count)
+        total_errors = num_rule_errors + CBA_CB_M2.count_default_label_errors(default_label, label_count)
+        classifier_M2.rule_insertion(rule, default_label, total_errors)
+    classifier_M2.rule_cleaning()
+    return classifier_M2
+
+
+def test_build_classifier_M2_is_the_reference(data_list):
+    CARs = rulegenerator.rule_generator_main(data_list, 0.01, 0.5)
+    CARs.prune_rules(data_list)
+    CARs.CARs_rule = CARs.pruned_CARs
+    expected = reference_M2(CARs, data_list)
+    classifier = CBA_CB_M2.build_classifier_M2(CARs, data_list)
+    assert [(rule.condset, rule.label) for rule in classifier.rule_list] == \
+        [(rule.condset, rule.label) for rule in expected.rule_list]
+    assert classifier.default_label == expected.default_label
+
+
+def test_build_classifier_M2_only_reads_the_data_list(data_list):
+    CARs = rulegenerator.rule_generator_main(data_list, 0.01, 0.5)
+    before = copy.deepcopy(data_list)
+    classifier = CBA_CB_M2.build_classifier_M2(CARs, data_list)
+    assert data_list == before
+    # the same data_list builds the same classifier again
+    again = CBA_CB_M2.build_classifier_M2(CARs, data_list)
+    assert [(rule.condset, rule.label) for rule in again.rule_list] == \
+        [(rule.condset, rule.label) for rule in classifier.rule_list]
+    assert again.default_label == classifier.default_label
+
+
+def test_find_wSet_index_is_the_scan(data_list):
+    CARs = rulegenerator.rule_generator_main(data_list, 0.01, 0.5)
+    CARs_list = [CBA_CB_M2.Rule(rule.condset, rule.label, data_list) for rule in CBA_CB_M2.M1_sort_CARs(CARs)]
+    U = set(range(0, len(CARs_list), 2))
+    U_index = CBA_CB_M2.RuleIndex(U, CARs_list)
+    for data in data_list:
+        for cRule in (None, CARs_list[len(CARs_list) // 2], CARs_list[-1]):
+            assert U_index.find_wSet(data, cRule) == find_wSet(U, data, cRule, CARs_list)
+
+
+def test_sorted_rules_are_in_precedence_order(data_list):
+    cars = rulegenerator.rule_generator_main(data_list, 0.01, 0.5, max_rules=None)
+    rule_list = CBA_CB_M2.M1_sort_CARs(cars)
+    for r1, r2 in zip(rule_list, rule_list[1:]):
+        assert compare_rules(r1, r2) >= 0
+    # independent of the order of the rules in the set
+    shuffled = rulegenerator.CARs()
+    rules = list(cars.CARs_rule)
+    random.Random(0).shuffle(rules)
+    shuffled.CARs_rule = set(rules)
+    assert CBA_CB_M2.M1_sort_CARs(shuffled) == rule_list
+
+
+def test_rule_list_predictor_is_the_first_covering_rule(data_list):
+    CARs = rulegenerator.rule_generator_main(data_list, 0.01, 0.5)
+    classifier = CBA_CB_M2.build_classifier_M2(CARs, data_list)
+    rule_list_predictor = predictor.compile_classifier(classifier)
+    for data in data_list:
+        label = next((rule.label for rule in classifier.rule_list if check_cover(data, rule) is not None),
+                     classifier.default_label)
+        assert rule_list_predictor.predict_one(data[:-1]) == label
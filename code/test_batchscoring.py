@@ -0,0 +1,73 @@
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+import batchscoring
+import CBA_CB_M2
+import Part5_CR_Tree
+import Part5_Classifier
+import Part5_FP_Tree
+import predictor
+import rulebudget
+import rulegenerator
+from conftest import read_dataset
+
+DATASETS = ["glass", "wine", "iris", "pima", "tic-tac-toe", "caesarian", "car"]
+
+
+@pytest.mark.parametrize("name", DATASETS)
+def test_predict_CR_tree_is_classify(name):
+    data_list = read_dataset(name)
+    min_sup = 0.01 * len(data_list)
+    f_list = Part5_FP_Tree.ordered_F_list(data_list, min_sup)
+    FP_tree_root, FP_header_table = Part5_FP_Tree.create_FP_tree(data_list, f_list)
+    # the search of wine does not fit in memory without the limit of patterns, like in Part5_CMAR_Main.py
+    budget = rulebudget.RuleBudget(max_candidates=2000 if name == "wine" else None)
+    CR_tree_root = Part5_FP_Tree.rule_generator(f_list, FP_header_table, min_sup, 0.5, data_list, budget)
+    CR_tree_root, CR_header_table, num_rules = Part5_CR_Tree.last_pruning(CR_tree_root, 4, data_list)
+    class_sup_dic, t = Part5_Classifier.class_sup_preprocess(data_list)
+    expected = [Part5_Classifier.classify(row[:-1], CR_tree_root, class_sup_dic, t) for row in data_list]
+    # an object array, some columns of car keep their string values
+    cases = numpy.array([row[:-1] for row in data_list], dtype=object)
+    assert list(batchscoring.predict_CR_tree(CR_tree_root, class_sup_dic, t, cases)) == expected
+
+
+@pytest.mark.parametrize("name", ["iris", "caesarian", "car"])
+def test_predict_rule_list_is_the_rule_list_predictor(name):
+    data_list = read_dataset(name)
+    CARs = rulegenerator.rule_generator_main(data_list, 0.01, 0.5)
+    classifier = CBA_CB_M2.build_classifier_M2(CARs, data_list)
+    expected = predictor.compile_classifier(classifier).predict(data_list)
+    # an object array, some columns of car keep their string values
+    cases = numpy.array([row[:-1] for row in data_list], dtype=object)
+    assert list(batchscoring.predict_rule_list(classifier, cases)) == expected
+
+
+def test_equal_weighted_x2_picks_the_smallest_label():
+    # two rules of the same statistics and different class labels covering the same data case
+    CR_tree_root = Part5_CR_Tree.CRTNode("CR root", None)
+    for attri, label in (((0, 1), 'b'), ((1, 1), 'a')):
+        node = Part5_CR_Tree.CRTNode(attri, CR_tree_root)
+        node.label, node.support, node.confidence, node.x2 = label, 2, 0.5, 1.0
+        CR_tree_root.child[attri] = node
+    class_sup_dic, t = {'b': 5, 'a': 5}, 10
+    assert Part5_Classifier.classify([1, 1], CR_tree_root, class_sup_dic, t) == 'a'
+    cases = numpy.array([[1, 1]])
+    assert list(batchscoring.predict_CR_tree(CR_tree_root, class_sup_dic, t, cases)) == ['a']
+
+
+@pytest.mark.parametrize("name", ["iris", "caesarian", "car"])
+def test_rows_with_the_class_label(name):
+    # the preprocessed rows themselves, the class label column is not omitted
+    data_list = read_dataset(name)
+    classifier = CBA_CB_M2.build_classifier_M2(rulegenerator.rule_generator_main(data_list, 0.01, 0.5), data_list)
+    expected = predictor.RuleListPredictor(classifier.rule_list, classifier.default_label).predict(data_list)
+    assert list(batchscoring.predict_rule_list(classifier, data_list)) == expected
+
+    min_sup = 0.01 * len(data_list)
+    f_list = Part5_FP_Tree.ordered_F_list(data_list, min_sup)
+    FP_tree_root, FP_header_table = Part5_FP_Tree.create_FP_tree(data_list, f_list)
+    CR_tree_root = Part5_FP_Tree.rule_generator(f_list, FP_header_table, min_sup, 0.5, data_list)
+    class_sup_dic, t = Part5_Classifier.class_sup_preprocess(data_list)
+    expected = [Part5_Classifier.classify(row[:-1], CR_tree_root, class_sup_dic, t) for row in data_list]
+    assert list(batchscoring.predict_CR_tree(CR_tree_root, class_sup_dic, t, data_list)) == expected
@@ -0,0 +1,30 @@
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+import batchscoring
+import CBA_CB_M2
+import columnar
+import predictor
+import rulegenerator
+from conftest import rule_set
+
+
+def test_columnar_data_is_the_data_list(data_list):
+    columnar_data = columnar.to_columnar(data_list)
+    assert len(columnar_data) == len(data_list)
+    assert list(columnar_data) == data_list
+    assert columnar_data[3] == data_list[3]
+    assert list(columnar_data[5:20]) == data_list[5:20]
+
+
+def test_columnar_rules_are_the_data_list_rules(data_list):
+    columnar_data = columnar.to_columnar(data_list)
+    assert rule_set(rulegenerator.rule_generator_main(columnar_data, 0.01, 0.5)) == \
+        rule_set(rulegenerator.rule_generator_main(data_list, 0.01, 0.5))
+
+
+def test_columnar_batch_prediction(data_list):
+    classifier = CBA_CB_M2.build_classifier_M2(rulegenerator.rule_generator_main(data_list, 0.01, 0.5), data_list)
+    expected = predictor.compile_classifier(classifier).predict(data_list)
+    assert list(batchscoring.predict_rule_list(classifier, columnar.to_columnar(data_list))) == expected
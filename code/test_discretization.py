@@ -0,0 +1,142 @@
+import random
+
+import discretization
+import preprocessing
+from conftest import read_raw_dataset, SMALL_DATASETS
+
+DATASETS = ["glass", "wine", "iris", "pima", "caesarian"]
+
+
+def baseline_binary_split(datablock):
+    """ binary_split of the original code: split the data cases at every distinct value but the smallest,
+    keep the acceptable cut of maximum entropy gain, the largest value on equal gain. """
+    split_point = []
+    for value in sorted(set(x[0] for x in datablock.data))[1:]:
+        left_block = discretization.DataBlock([data for data in datablock.data if data[0] < value])
+        right_block = discretization.DataBlock([data for data in datablock.data if data[0] >= value])
+        entropy_gain = discretization.calculate_entropy_gain(datablock, left_block, right_block)
+        if entropy_gain >= discretization.calculate_minimum_gain(datablock, left_block, right_block):
+            split_point.append([value, entropy_gain, left_block, right_block])
+    if split_point:
+        split_point.sort(key=lambda wall: wall[1])
+        return split_point[-1]
+    return None
+
+
+def baseline_complete_split(datablock):
+    split_points = []
+
+    def recursive_split(datablock):
+        split_point = baseline_binary_split(datablock)
+        if split_point:
+            split_points.append(split_point[0])
+            recursive_split(split_point[2])
+            recursive_split(split_point[3])
+
+    recursive_split(datablock)
+    return sorted(split_points)
+
+
+def numerical_columns(name):
+    data_list, attributes, attribute_types = read_raw_dataset(name)
+    for column in range(len(attribute_types) - 1):
+        if attribute_types[column] == 'numerical':
+            yield [[data[column], data[-1]] for data in data_list]
+
+
+def random_columns():
+    generator = random.Random(0)
+    for size in (2, 3, 5, 20, 100):
+        for repeat in range(20):
+            yield [[generator.randint(0, 5), generator.choice("ab")] for i in range(size)]
+
+
+def test_complete_split_is_the_baseline():
+    for name in DATASETS:
+        for data in numerical_columns(name):
+            assert discretization.complete_split(discretization.DataBlock(data)) == \
+                baseline_complete_split(discretization.DataBlock(data))
+    for data in random_columns():
+        assert discretization.complete_split(discretization.DataBlock(data)) == \
+            baseline_complete_split(discretization.DataBlock(data))
+
+
+def test_single_class_block_of_two_cases():
+    # a zero-gain cut passes the zero minimum gain requirement, but it is not a boundary point
+    data = [[1.0, 'a'], [2.0, 'a']]
+    assert discretization.complete_split(discretization.DataBlock(data)) == [2.0]
+    assert discretization.complete_split(discretization.DataBlock(data), boundary_only=True) == []
+
+
+def test_boundary_only_keeps_the_split_points_of_the_bundled_datasets():
+    for name in DATASETS:
+        for data in numerical_columns(name):
+            assert discretization.complete_split(discretization.DataBlock(data), boundary_only=True) == \
+                discretization.complete_split(discretization.DataBlock(data))
+
+
+
+def test_boundary_only_through_preprocessing_main(tmp_path):
+    for name in SMALL_DATASETS:
+        data_list, attributes, attribute_types = read_raw_dataset(name)
+        encoding, boundary_encoding = dict(), dict()
+        boundary_data = preprocessing.preprocessing_main([list(row) for row in data_list], attributes, attribute_types,
+                                                         boundary_encoding, boundary_only=True)
+        assert boundary_data == preprocessing.preprocessing_main(data_list, attributes, attribute_types, encoding)
+        assert boundary_encoding == encoding
+    # the only cut of a single-class column of two data cases is not a boundary point
+    data_list = [[1.0, 'a'], [2.0, 'a']]
+    attributes, attribute_types = ['x', 'class'], ['numerical', 'label']
+    encoding, boundary_encoding = dict(), dict()
+    preprocessing.preprocessing_main([list(row) for row in data_list], attributes, attribute_types, encoding)
+    preprocessing.preprocessing_main([list(row) for row in data_list], attributes, attribute_types,
+                                     boundary_encoding, boundary_only=True)
+    assert encoding[0] != boundary_encoding[0]
+    assert preprocessing.Preprocessor().fit(data_list, attribute_types, boundary_only=True).encoding == \
+        boundary_encoding
+    # and through the streaming encoder
+    data_path, names_path = str(tmp_path / 'x.data'), str(tmp_path / 'x.names')
+    with open(data_path, 'w') as data_file:
+        data_file.write(''.join('%s,%s\n' % tuple(row) for row in data_list))
+    with open(names_path, 'w') as names_file:
+        names_file.write('x,class\nnumerical,label\n')
+    assert preprocessing.find_encoding_streaming(data_path, names_path, boundary_only=True) == boundary_encoding
+    assert preprocessing.find_encoding_streaming(data_path, names_path) == encoding
+
+
+def histogram_of(data, max_bins=discretization.DEFAULT_MAX_BINS):
+    histogram = discretization.StreamingHistogram(max_bins)
+    for value, label in data:
+        histogram.add(value, label)
+    return histogram
+
+
+def test_exact_histogram_split_is_complete_split():
+    for name in DATASETS:
+        for data in numerical_columns(name):
+            histogram = histogram_of(data)
+            assert histogram.max_shift() == 0
+            assert discretization.complete_split_histogram(histogram) == \
+                discretization.complete_split(discretization.DataBlock(data))
+    for data in random_columns():
+        assert discretization.complete_split_histogram(histogram_of(data)) == \
+            discretization.complete_split(discretization.DataBlock(data))
+
+
+def test_bounded_histogram_reports_its_shift():
+    generator = random.Random(0)
+    data = [[generator.random(), generator.choice("abc")] for i in range(5000)]
+    histogram = histogram_of(data, max_bins=64)
+    assert len(histogram.get_bins()) <= 64
+    assert not histogram.exact
+    assert 0 < histogram.max_shift() <= len(data)
+    assert sum(sum(b[2].values()) for b in histogram.get_bins()) == len(data)
+
+
+def test_max_bins_per_column_caps_the_memory():
+    assert discretization.max_bins_per_column(1, max_memory=None) == discretization.DEFAULT_MAX_BINS
+    for num_columns in (1, 10, 1000):
+        max_bins = discretization.max_bins_per_column(num_columns, max_memory=1 << 20)
+        assert discretization.MIN_BINS <= max_bins <= discretization.DEFAULT_MAX_BINS
+        assert max_bins == discretization.MIN_BINS or \
+            2 * discretization.BIN_SIZE * num_columns * max_bins <= 1 << 20
@@ -0,0 +1,57 @@
+import pytest
+
+import CBA_CB_M2
+import modelfile
+import Part5_CR_Tree
+import Part5_Classifier
+import Part5_FP_Tree
+import predictor
+import preprocessing
+import rulegenerator
+from conftest import read_raw_dataset, SMALL_DATASETS
+
+
+@pytest.fixture(params=SMALL_DATASETS)
+def dataset(request):
+    """ The raw rows without the class label, the preprocessed data_list and its encoding. """
+    data_list, attributes, attribute_types = read_raw_dataset(request.param)
+    rows = [row[:-1] for row in data_list]
+    encoding = dict()
+    data_list = preprocessing.preprocessing_main(data_list, attributes, attribute_types, encoding)
+    return rows, data_list, encoding
+
+
+def test_CBA_model_round_trip(dataset, tmp_path):
+    rows, data_list, encoding = dataset
+    classifier = CBA_CB_M2.build_classifier_M2(rulegenerator.rule_generator_main(data_list, 0.01, 0.5), data_list)
+    path = str(tmp_path / "model")
+    modelfile.save_CBA_model(path, classifier, encoding)
+    model = modelfile.load_model(path)
+    assert model.kind == "CBA" and model.encoding == encoding
+    assert [(rule.condset, rule.label) for rule in model.classifier.rule_list] == \
+        [(rule.condset, rule.label) for rule in classifier.rule_list]
+    assert model.predict(rows) == predictor.compile_classifier(classifier).predict(data_list)
+
+
+def test_CMAR_model_round_trip(dataset, tmp_path):
+    rows, data_list, encoding = dataset
+    min_sup = 0.01 * len(data_list)
+    f_list = Part5_FP_Tree.ordered_F_list(data_list, min_sup)
+    FP_tree_root, FP_header_table = Part5_FP_Tree.create_FP_tree(data_list, f_list)
+    CR_tree_root = Part5_FP_Tree.rule_generator(f_list, FP_header_table, min_sup, 0.5, data_list)
+    CR_tree_root, CR_header_table, num_rules = Part5_CR_Tree.last_pruning(CR_tree_root, 4, data_list)
+    class_sup_dic, t = Part5_Classifier.class_sup_preprocess(data_list)
+    path = str(tmp_path / "model")
+    modelfile.save_CMAR_model(path, CR_tree_root, class_sup_dic, t, encoding)
+    model = modelfile.load_model(path)
+    assert model.kind == "CMAR" and model.t == t and model.class_sup_dic == class_sup_dic
+    assert Part5_CR_Tree.CRT_rules(model.CR_tree_root) == Part5_CR_Tree.CRT_rules(CR_tree_root)
+    assert model.predict(rows) == \
+        [Part5_Classifier.classify(row[:-1], CR_tree_root, class_sup_dic, t) for row in data_list]
+
+
+def test_not_a_model_file(tmp_path):
+    path = tmp_path / "model"
+    path.write_bytes(b"NOTAMODEL" * 4)
+    with pytest.raises(ValueError):
+        modelfile.load_model(str(path))
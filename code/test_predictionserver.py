@@ -0,0 +1,116 @@
+import asyncio
+import json
+
+import pytest
+
+import CBA_CB_M2
+import modelfile
+import predictionserver
+import rulegenerator
+from conftest import read_dataset, read_raw_dataset
+
+
+@pytest.fixture(scope="module")
+def iris_model(tmp_path_factory):
+    rows = [row[:-1] for row in read_raw_dataset('iris')[0]]
+    encoding = dict()
+    data_list = read_dataset('iris', encoding)
+    classifier = CBA_CB_M2.build_classifier_M2(rulegenerator.rule_generator_main(data_list, 0.01, 0.5), data_list)
+    path = str(tmp_path_factory.mktemp("model") / "iris.model")
+    modelfile.save_CBA_model(path, classifier, encoding)
+    return modelfile.load_model(path), rows
+
+
+def run_server(model, client, **options):
+    """ Run the server on a free port, then the coroutine client(port, server). """
+    async def main():
+        server = predictionserver.PredictionServer(model, **options)
+        listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+        batcher = asyncio.ensure_future(server.batcher.run())
+        try:
+            return await client(listener.sockets[0].getsockname()[1], server)
+        finally:
+            batcher.cancel()
+            listener.close()
+            await listener.wait_closed()
+    return asyncio.run(main())
+
+
+async def send(port, request):
+    """ Send a raw request, return the status code and the JSON body of the response. """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(request)
+    await writer.drain()
+    status_line = await reader.readline()
+    response = await reader.read()
+    writer.close()
+    return int(status_line.split()[1]), json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+
+def post(rows):
+    body = json.dumps({"rows": rows}).encode("utf-8")
+    return (b"POST /predict HTTP/1.1\r\nConnection: close\r\nContent-Length: %d\r\n\r\n" % len(body)) + body
+
+
+def test_concurrent_requests_are_scored_in_one_batch(iris_model):
+    model, rows = iris_model
+
+    async def client(port, server):
+        responses = await asyncio.gather(*[send(port, post(rows[i:i + 10])) for i in range(0, len(rows), 10)])
+        return responses, server.stats.num_batches
+
+    responses, num_batches = run_server(model, client, max_delay=0.5)
+    assert [status for status, body in responses] == [200] * len(responses)
+    assert [label for status, body in responses for label in body["labels"]] == model.predict(rows)
+    assert num_batches < len(responses)
+
+
+def test_bad_request_does_not_fail_its_batch(iris_model):
+    model, rows = iris_model
+
+    async def client(port, server):
+        return await asyncio.gather(send(port, post(rows[:5])), send(port, post([["x"]])))
+
+    (good_status, good_body), (bad_status, bad_body) = run_server(model, client, max_delay=0.5)
+    assert good_status == 200 and good_body["labels"] == model.predict(rows[:5])
+    assert bad_status == 500
+
+
+def test_body_above_the_maximum_size(iris_model):
+    model, rows = iris_model
+
+    async def client(port, server):
+        return await send(port, b"POST /predict HTTP/1.1\r\nContent-Length: 1000000\r\n\r\n")
+
+    status, body = run_server(model, client, max_body_size=1000)
+    assert status == 413
+
+
+class ClosedWriter:
+    """ Writer of a connection closed by the client. """
+    def __init__(self):
+        self.written = b""
+
+    def write(self, data):
+        self.written += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_client_closing_in_the_body(iris_model):
+    model, rows = iris_model
+
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"POST /predict HTTP/1.1\r\nContent-Length: 100\r\n\r\n{\"rows\"")
+        reader.feed_eof()
+        writer = ClosedWriter()
+        await predictionserver.PredictionServer(model).handle_connection(reader, writer)
+        return writer.written
+
+    # the connection is closed without an answer or an exception
+    assert asyncio.run(main()) == b""
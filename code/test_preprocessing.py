@@ -0,0 +1,56 @@
+import preprocessing
+import readfile
+from conftest import dataset_paths, read_raw_dataset, SMALL_DATASETS
+
+
+def test_preprocessor_transform_is_preprocessing_main():
+    for name in SMALL_DATASETS:
+        data_list, attributes, attribute_types = read_raw_dataset(name)
+        preprocessor = preprocessing.Preprocessor().fit(data_list, attribute_types)
+        transformed = preprocessor.transform(data_list)
+        # new data, without the class label, is preprocessed with the same encoding
+        assert preprocessor.transform([row[:-1] for row in data_list]) == [row[:-1] for row in transformed]
+        encoding = dict()
+        # preprocessing_main replaces the values of the data_list
+        assert transformed == preprocessing.preprocessing_main(data_list, attributes, attribute_types, encoding)
+        assert preprocessor.encoding == encoding
+
+
+def test_discretize_value_is_complete_discretization():
+    split_points = [1.5, 2.5, 4.0]
+    for value in (0.0, 1.5, 1.6, 2.5, 3.9, 4.0, 4.1, 10.0):
+        assert preprocessing.discretize_value(value, split_points) == \
+            preprocessing.complete_discretization([[value]], 0, split_points)[0][0]
+
+
+def test_parallel_split_points_are_the_serial_ones():
+    for name in SMALL_DATASETS:
+        data_list, attributes, attribute_types = read_raw_dataset(name)
+        assert preprocessing.find_all_split_points(data_list, attribute_types, workers=2) == \
+            preprocessing.find_all_split_points(data_list, attribute_types)
+
+
+def test_preprocessing_columns_is_preprocessing_main():
+    for name in SMALL_DATASETS:
+        columns, missing, attributes, attribute_types = readfile.read_columns(*dataset_paths(name))
+        encoding = dict()
+        data_list = preprocessing.preprocessing_columns(columns, missing, attributes, attribute_types, encoding)
+        data_encoding = dict()
+        assert data_list == preprocessing.preprocessing_main(*read_raw_dataset(name), data_encoding)
+        assert encoding == data_encoding
+
+
+def test_preprocessing_columns_missing_values(tmp_path):
+    data_path = str(tmp_path / 'missing.data')
+    names_path = str(tmp_path / 'missing.names')
+    with open(names_path, 'w') as names_file:
+        names_file.write("a,b,class\nnumerical,categorical,label\n")
+    with open(data_path, 'w') as data_file:
+        data_file.write("1,x,yes\n?,y,no\n2,x,yes\n5,y,no\n6,y,no\n")
+    columns, missing, attributes, attribute_types = readfile.read_columns(data_path, names_path)
+    encoding = dict()
+    data_list = preprocessing.preprocessing_columns(columns, missing, attributes, attribute_types, encoding)
+    # the split points are those of the values that are not missing, a missing value is replaced with 0
+    assert encoding[0] == preprocessing.find_split_points([1.0, 2.0, 5.0, 6.0], ['yes', 'yes', 'no', 'no'])
+    assert data_list == preprocessing.apply_encoding(readfile.read_files(data_path, names_path)[0], encoding)
+    assert data_list[1][0] == 0
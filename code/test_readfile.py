@@ -0,0 +1,35 @@
+import readfile
+from conftest import dataset_paths, SMALL_DATASETS
+
+
+def test_columns_are_the_columns_of_read_files():
+    for name in SMALL_DATASETS:
+        data_path, names_path = dataset_paths(name)
+        columns, missing, attribute_names, attribute_types = readfile.read_columns(data_path, names_path,
+                                                                                   chunk_size=100)
+        data_list, attributes, types = readfile.read_files(data_path, names_path)
+        assert (attribute_names, attribute_types) == (attributes, types)
+        assert missing == dict()
+        assert [list(column) for column in columns] == [list(column) for column in zip(*data_list)]
+
+
+def test_columns_missing_values(tmp_path):
+    data_path = str(tmp_path / 'missing.data')
+    names_path = str(tmp_path / 'missing.names')
+    with open(names_path, 'w') as names_file:
+        names_file.write("a,b,c,class\nnumerical,categorical,numerical,label\n")
+    with open(data_path, 'w') as data_file:
+        data_file.write("1.5,x,?,yes\n\n?,y,nan,no\n2,?,3,yes\n")
+    columns, missing, attribute_names, attribute_types = readfile.read_columns(data_path, names_path)
+    assert dict((column, list(rows)) for column, rows in missing.items()) == {0: [1], 2: [0]}
+    assert columns[0][0] == 1.5 and columns[0][2] == 2.0
+    assert columns[1] == ['x', 'y', '?'] and columns[3] == ['yes', 'no', 'yes']
+    # a value 'nan' of the data file is a number, not a missing value
+    assert columns[2][1] != columns[2][1] and 1 not in missing[2]
+
+
+def test_batches_are_the_rows_of_read_files():
+    data_path, names_path = dataset_paths("iris")
+    batches = list(readfile.read_batches(data_path, names_path, batch_size=32, chunk_size=50))
+    assert [len(batch) for batch in batches[:-1]] == [32] * (len(batches) - 1)
+    assert [row for batch in batches for row in batch] == readfile.read_files(data_path, names_path)[0]
@@ -0,0 +1,151 @@
+import itertools
+import random
+
+import pytest
+
+import bitset
+import CBA_CB_M2
+import rulebudget
+import rulegenerator
+import ruleitem
+from conftest import read_dataset, rule_set
+
+ENGINES = ["apriori", "eclat", "fpgrowth"]
+
+
+def ranked(cars):
+    """ The rules from the highest precedence, see rulebudget. """
+    return sorted(((ruleitem.condset_key(rule.condset), rule.label) for rule in cars.CARs_rule),
+                  key=lambda rule: rank_key(cars, rule))
+
+
+def rank_key(cars, rule):
+    item = cars.CARs_index[rule[0]]
+    return CBA_CB_M2.precedence_key(item), rulebudget.tie_key(item.condset.items(), item.label)
+
+
+def test_bitset_counts_are_the_scan_counts(data_list):
+    bitset_data = bitset.BitsetData(data_list)
+    for rule in rulegenerator.rule_generator_main(data_list, 0.01, 0.5, max_rules=None).CARs_rule:
+        scanned = ruleitem.RuleItem(rule.condset, rule.label, data_list)
+        assert bitset_data.count(rule.condset, rule.label) == (scanned.condsupCount, scanned.rulesupCount)
+        assert (rule.condsupCount, rule.rulesupCount) == (scanned.condsupCount, scanned.rulesupCount)
+
+
+def test_condset_index_keeps_one_rule_per_condset(data_list):
+    frequent_ruleitems = rulegenerator.FrequentRuleitemSet()
+    frequent_ruleitems.add(ruleitem.RuleItem({0: 1, 1: 1}, data_list[0][-1], data_list))
+    # the same condset in another order
+    frequent_ruleitems.add(ruleitem.RuleItem({1: 1, 0: 1}, data_list[0][-1], data_list))
+    assert frequent_ruleitems.get_num() == 1
+
+    cars = rulegenerator.rule_generator_main(data_list, 0.01, 0.5, max_rules=None)
+    keys = [ruleitem.condset_key(rule.condset) for rule in cars.CARs_rule]
+    assert len(keys) == len(set(keys))
+    for rule in cars.CARs_rule:
+        assert cars.CARs_index[ruleitem.condset_key(rule.condset)] is rule
+
+
+def test_candidateGen_is_apriori_gen(data_list):
+    min_support = 0.01
+    frequent = rulegenerator.FrequentRuleitemSet()
+    for column in range(len(data_list[0]) - 1):
+        for value in set(data[column] for data in data_list):
+            for label in set(data[-1] for data in data_list):
+                rule_item = ruleitem.RuleItem({column: value}, label, data_list)
+                if rule_item.support >= min_support:
+                    frequent.add(rule_item)
+    for level in range(2, 4):
+        candidates = rulegenerator.candidateGen(frequent)
+        # every union of two frequent ruleitems of the same label, one item longer, whose subsets are all frequent
+        expected = set()
+        for (key1, label1), (key2, label2) in itertools.combinations(frequent.rule_index, 2):
+            union = tuple(sorted(set(key1) | set(key2)))
+            if label1 != label2 or len(union) != level or len(set(column for column, value in union)) != level:
+                continue
+            if all((subset, label1) in frequent.rule_index for subset in itertools.combinations(union, level - 1)):
+                expected.add((union, label1))
+        assert sorted(candidates, key=repr) == sorted(expected, key=repr)
+        frequent = rulegenerator.count_frequent_ruleitems(candidates, data_list, min_support)
+
+
+def test_count_candidates_is_a_scan(data_list):
+    keys = set()
+    generator = random.Random(0)
+    for repeat in range(200):
+        columns = sorted(generator.sample(range(len(data_list[0]) - 1), 2))
+        data = generator.choice(data_list)
+        keys.add(tuple((column, data[column]) for column in columns))
+    counts = rulegenerator.count_candidates(keys, data_list)
+    for key in keys:
+        covered = [data[-1] for data in data_list if all(data[column] == value for column, value in key)]
+        label_count = dict((label, covered.count(label)) for label in set(covered))
+        assert counts[key][0] == len(covered)
+        assert dict((label, count) for label, count in counts[key][1].items() if count) == label_count
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_rule_budget_keeps_the_top_rules(data_list, engine):
+    everything = rulegenerator.rule_generator_main(data_list, 0.01, 0.5, max_rules=None, engine=engine)
+    for max_rules in (0, 1, 10, 100):
+        kept = rulegenerator.rule_generator_main(data_list, 0.01, 0.5, max_rules=max_rules, engine=engine)
+        assert ranked(kept) == ranked(everything)[:max_rules]
+
+
+def test_default_rules_are_the_top_rules_of_the_search():
+    # glass has levels of more than 2000 candidates, the limit of candidates used to be on by default
+    data_list = read_dataset("glass")
+    everything = rulegenerator.rule_generator_main(data_list, 0.01, 0.5, max_rules=None)
+    kept = rulegenerator.rule_generator_main(data_list, 0.01, 0.5)
+    assert ranked(kept) == ranked(everything)[:rulebudget.DEFAULT_MAX_RULES]
+
+
+def test_rule_budget_evicts_the_lowest_precedence():
+    budget = rulebudget.RuleBudget(max_rules=2)
+    rules = [("a", 0.5, 0.1, 1), ("b", 0.9, 0.1, 1), ("c", 0.9, 0.2, 2), ("d", 0.7, 0.3, 1)]
+    for name, confidence, support, length in rules:
+        budget.push(name, confidence, support, length, rulebudget.tie_key([(0, name)], name))
+    assert budget.get_rules() == ["c", "b"]
+    assert not budget.admits(0.8, 1.0, 1, rulebudget.tie_key([], "e"))
+
+
+def scan_errors(condset, label, data_list):
+    """ The number of data cases covered by the condset with another class label. """
+    return sum(1 for data in data_list
+               if data[-1] != label and all(data[column] == value for column, value in condset.items()))
+
+
+def scan_prune(rule, data_list):
+    """ should_prune by scanning: a condset with one condition less makes fewer errors. """
+    if len(rule.condset) == 1:
+        return False
+    errors = scan_errors(rule.condset, rule.label, data_list)
+    return any(scan_errors(dict((c, v) for c, v in rule.condset.items() if c != column), rule.label, data_list) < errors
+               for column in rule.condset)
+
+
+def test_prune_rules_reuses_the_counts(data_list):
+    cars = rulegenerator.rule_generator_main(data_list, 0.01, 0.5, max_rules=None)
+    cars.prune_rules(data_list)
+    expected = set(rule for rule in cars.CARs_rule if not scan_prune(rule, data_list))
+    assert cars.pruned_CARs == expected
+    assert expected == set(rule for rule in cars.CARs_rule if not rulegenerator.should_prune(rule, data_list))
+
+
+@pytest.mark.parametrize("engine", ["eclat", "fpgrowth"])
+def test_engines_return_the_same_CARs(data_list, engine):
+    for max_rules in (None, 50):
+        apriori = rulegenerator.rule_generator_main(data_list, 0.01, 0.5, max_rules=max_rules)
+        other = rulegenerator.rule_generator_main(data_list, 0.01, 0.5, max_rules=max_rules, engine=engine)
+        assert rule_set(other) == rule_set(apriori)
+
+
+@pytest.mark.parametrize("engine", ["eclat", "fpgrowth"])
+def test_engines_return_the_same_CARs_at_the_default_arguments(engine):
+    # the levels of glass and tic-tac-toe exceed 2000 candidates, the old default limit of the apriori engine
+    for name in ("glass", "tic-tac-toe"):
+        data_list = read_dataset(name)
+        assert rule_set(rulegenerator.rule_generator_main(data_list, 0.01, 0.5, engine=engine)) == \
+            rule_set(rulegenerator.rule_generator_main(data_list, 0.01, 0.5))
+    with pytest.raises(ValueError):
+        rulegenerator.rule_generator_main(data_list, 0.01, 0.5, max_candidates=2000, engine=engine)
@@ -0,0 +1,49 @@
+import shutil
+
+import preprocessing
+import rulegenerator
+import streaming
+from conftest import dataset_paths, read_dataset, rule_set, SMALL_DATASETS
+
+
+def test_streaming_encoding_is_the_encoding_of_preprocessing_main():
+    for name in SMALL_DATASETS:
+        data_path, names_path = dataset_paths(name)
+        encoding = dict()
+        preprocessed = read_dataset(name, encoding)
+        assert preprocessing.find_encoding_streaming(data_path, names_path) == encoding
+        stream = streaming.BatchStream(data_path, names_path, encoding, batch_size=16)
+        assert list(stream) == preprocessed
+
+
+def test_streaming_rule_generator_returns_the_in_memory_rules():
+    data_path, names_path = dataset_paths('iris')
+    encoding = dict()
+    preprocessed = read_dataset('iris', encoding)
+    stream = streaming.BatchStream(data_path, names_path, encoding, batch_size=16)
+    in_memory = rulegenerator.rule_generator_main(preprocessed, 0.01, 0.5)
+    streamed = rulegenerator.rule_generator_main(stream, 0.01, 0.5)
+    assert rule_set(streamed) == rule_set(in_memory)
+
+
+def test_streaming_missing_value(tmp_path):
+    data_path, names_path = dataset_paths('iris')
+    with open(data_path) as data_file:
+        lines = [line for line in data_file.read().splitlines() if line]
+    # a missing value in a numerical column
+    values = lines[0].split(',')
+    values[2] = '?'
+    lines[0] = ','.join(values)
+    missing_path = str(tmp_path / 'iris.data')
+    with open(missing_path, 'w') as data_file:
+        data_file.write('\n'.join(lines) + '\n')
+    shutil.copy(names_path, str(tmp_path / 'iris.names'))
+    missing_names_path = str(tmp_path / 'iris.names')
+
+    encoding = preprocessing.find_encoding_streaming(missing_path, missing_names_path)
+    stream = streaming.BatchStream(missing_path, missing_names_path, encoding, batch_size=16)
+    rows = list(stream)
+    assert len(rows) == len(lines)
+    assert rows[0][2] == 0
+    assert all(row[2] > 0 for row in rows[1:])
+    assert rulegenerator.rule_generator_main(stream, 0.01, 0.5).CARs_rule